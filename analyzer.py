@@ -1,42 +1,80 @@
 import os
 from pathlib import Path
 import numpy as np
-from typing import List
-from sentence_transformers import util
+from collections import Counter
+from typing import List, Optional, Tuple
 from ollama_client import OllamaLLM
+from model_pool import ModelBackendPool
+from latency_budget import LatencyBudget, build_tiers, run_tiers, stats_summary
+from retrieval import RetrievalEngine
+from vectorizer import model as embedding_model
 
-BASE_DIR = Path("/data/vector_store")
-summarizer = OllamaLLM(model="gemma3:4b", host="http://localhost:11434")
+BASE_DIR = Path(os.getenv("VECTOR_STORE_DIR", "/data/vector_store"))
+# Бэкенды берутся из MODEL_HOSTS (список) или OLLAMA_API_URL / MODEL_HOST:MODEL_PORT
+model_pool = ModelBackendPool.from_env()
+MAIN_MODEL = "gemma3:4b"
+FALLBACK_MODEL = "gemma3:1b"
+TOP_CHUNKS = 10
+# вес оценки аномальности (team_stats) при выборе чанков
+ANOMALY_WEIGHT = 0.3
+summarizers = {m: OllamaLLM(model=m, pool=model_pool) for m in (MAIN_MODEL, FALLBACK_MODEL)}
+summarizer = summarizers[MAIN_MODEL]
+# тот же энкодер, что и при сохранении эмбеддингов (vectorizer)
+retrieval_engine = RetrievalEngine(embedding_model)
 
-def load_latest_embeddings_with_texts(team_folder: Path, top_k: int = 3):
+def load_latest_embeddings_with_texts(team_folder: Path, top_k: int = 1):
+    """
+    Последние top_k отчётов команды: эмбеддинги, тексты чанков и их оценки
+    аномальности. История учтена в оценках (team_stats), поэтому по
+    умолчанию достаточно самого свежего отчёта.
+    """
     files = sorted(team_folder.glob("emb_*.npz"), key=os.path.getctime, reverse=True)
     embeddings = []
     chunks = []
+    anomaly = []
     for f in files[:top_k]:
         data = np.load(f, allow_pickle=True)
         embeddings.append(data["embedding"])
         chunks.extend(data["chunks"].tolist())
-    return np.vstack(embeddings), chunks
+        # файлы, сохранённые до появления team_stats, оценок не содержат
+        anomaly.append(data["anomaly"] if "anomaly" in data.files
+                       else np.zeros(len(data["chunks"]), dtype="float32"))
+    return np.vstack(embeddings), chunks, np.concatenate(anomaly)
 
-def analyze_team_reports(team_name: str) -> str:
+def status_counts(chunks: List[str]) -> Counter:
+    """Статусы тестов из чанков вида "Status: <status>" (см. vectorizer)."""
+    return Counter(c[len("Status: "):] for c in chunks if c.startswith("Status: "))
+
+def analyze_team_reports_tiered(team_name: str,
+                                budget: Optional[LatencyBudget] = None) -> Tuple[str, str]:
+    """Анализ в рамках бюджета; возвращает (текст, уровень, на котором он получен)."""
+    budget = budget or LatencyBudget()
     team_folder = BASE_DIR / team_name
     if not team_folder.exists():
-        return f"❌ Команда '{team_name}' не найдена"
+        return f"❌ Команда '{team_name}' не найдена", "none"
 
     try:
-        embeddings, chunks = load_latest_embeddings_with_texts(team_folder)
+        with budget.stage("fetch"):
+            embeddings, chunks, anomaly = load_latest_embeddings_with_texts(team_folder)
     except Exception as e:
-        return f"⚠️ Ошибка загрузки эмбеддингов: {e}"
+        return f"⚠️ Ошибка загрузки эмбеддингов: {e}", "none"
 
     if len(chunks) == 0 or embeddings.shape[0] == 0:
-        return "⚠️ Нет данных для анализа."
+        return "⚠️ Нет данных для анализа.", "none"
+
+    with budget.stage("retrieval"):
+        top_chunks = retrieval_engine.retrieve(chunks, embeddings, top_k=TOP_CHUNKS,
+                                               prior=anomaly, prior_weight=ANOMALY_WEIGHT)
+
+    def generate(tier, timeout):
+        summary_input = "\n".join(top_chunks[:tier.top_k])
+        return summarizers[tier.model](summary_input, max_length=200, do_sample=False,
+                                       timeout=timeout)[0]["generated_text"]
 
-    centroid = np.mean(embeddings, axis=0)
-    similarities = util.cos_sim(embeddings, centroid)
-    top_indices = similarities.squeeze().argsort()[-10:][::-1]
-    top_chunks = [chunks[i] for i in top_indices]
+    tiers = build_tiers(MAIN_MODEL, FALLBACK_MODEL, TOP_CHUNKS)
+    result, tier = run_tiers(budget, tiers, generate, lambda: stats_summary(status_counts(chunks)))
 
-    summary_input = "\n".join(top_chunks)
-    result = summarizer(summary_input, max_length=200, do_sample=False)[0]["generated_text"]
+    return f"🧠 Анализ отчётов команды '{team_name}':\n{result}", tier
 
-    return f"🧠 Анализ отчётов команды '{team_name}':\n{result}"
\ No newline at end of file
+def analyze_team_reports(team_name: str, budget: Optional[LatencyBudget] = None) -> str:
+    return analyze_team_reports_tiered(team_name, budget)[0]
\ No newline at end of file
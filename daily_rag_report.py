@@ -6,6 +6,7 @@ from datetime import datetime
 from report_storage_manager import extract_team_name, sanitize_folder_name
 from vectorizer import vectorize_report
 from analyzer import analyze_team_reports
+from report_cache import ReportCache
 
 # Настройки из окружения
 GET_URL_BASE = os.getenv('GET_URL_BASE')
@@ -16,12 +17,12 @@ ALLURE_PASS = os.getenv('ALLURE_PASS')
 MODEL_HOST = os.getenv('MODEL_HOST', 'localhost')
 MODEL_PORT = os.getenv('MODEL_PORT', '11434')
 
-def load_report_by_uuid(uuid):
+report_cache = ReportCache()
+
+def load_report_by_uuid(uuid, offline=False):
     get_url = f"{GET_URL_BASE}/{uuid}/suites/json"
     print(f"📥 Загружаем отчёт: {get_url}")
-    response = requests.get(get_url, auth=(ALLURE_USER, ALLURE_PASS), headers={"Accept": "application/json"})
-    response.raise_for_status()
-    return response.json()
+    return report_cache.fetch(get_url, (ALLURE_USER, ALLURE_PASS), key=uuid, offline=offline)
 
 def post_analysis(uuid, message):
     post_url = f"{POST_URL_BASE}/{uuid}"
@@ -35,12 +36,15 @@ def post_analysis(uuid, message):
     print(f"📤 Отправлен анализ (HTTP {response.status_code})")
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python daily_rag_report.py <uuid>")
+    # --from-cache: отчёт только из локального кэша, анализ печатается, а не отправляется
+    offline = "--from-cache" in sys.argv[1:]
+    args = [a for a in sys.argv[1:] if a != "--from-cache"]
+    if len(args) != 1:
+        print("Usage: python daily_rag_report.py <uuid> [--from-cache]")
         sys.exit(1)
 
-    uuid = sys.argv[1]
-    report_json = load_report_by_uuid(uuid)
+    uuid = args[0]
+    report_json = load_report_by_uuid(uuid, offline=offline)
 
     team_name = extract_team_name(report_json)
     folder_name = sanitize_folder_name(team_name)
@@ -50,12 +54,16 @@ def main():
     # Сохраняем новый эмбеддинг
     vectorize_report(report_json, folder_name)
 
-    # Анализируем последние 1–3 отчёта этой команды
+    # Анализируем последний отчёт команды; история учтена в оценке аномальности
     summary = analyze_team_reports(folder_name)
 
     print("📄 Summary готов:")
     print(summary)
 
+    if offline:
+        # offline-режим: в Allure ничего не отправляем
+        return
+
     # Отправляем обратно в Allure
     post_analysis(uuid, summary)
 
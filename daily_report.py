@@ -10,26 +10,38 @@ Usage:
   # Or specify full URLs directly:
   python daily_report.py --get-url GET_URL --post-url POST_URL --user USER --password PASS [--chunk-size CHUNK_SIZE] [--top-k TOP_K]
 
+  # Re-run analysis on a cached report without touching Allure (prints instead of posting):
+  python daily_report.py --uuid REPORT_UUID --from-cache [--model MODEL]
+
+  # Several Ollama backends (least-loaded routing, optional per-model routing):
+  python daily_report.py --uuid REPORT_UUID ... --hosts host1:11434,host2:11434=gemma3:4b
+
 Requires:
-  pip install requests sentence-transformers faiss-cpu
+  pip install requests sentence-transformers numpy
 """
 
 import os
 import sys
 import json
+import time
 import argparse
+import socket
+import threading
 import requests
+from urllib3.exceptions import ReadTimeoutError
 from datetime import datetime
 from collections import Counter
 
+from model_pool import ModelBackendPool
+from latency_budget import LatencyBudget, build_tiers, run_tiers, stats_summary
+from retrieval import RetrievalEngine
+from report_cache import ReportCache, DEFAULT_CACHE_DIR
+
 # Try to import RAG dependencies
 try:
     from sentence_transformers import SentenceTransformer
-    import numpy as np
-    import faiss
 except ImportError:
     SentenceTransformer = None
-    faiss = None
 
 # Enable UTF-8 output on Windows
 if os.name == 'nt':
@@ -40,7 +52,13 @@ if os.name == 'nt':
     except:
         pass
 
-def load_report_from_api(get_url, auth):
+def load_report_from_api(get_url, auth, cache=None, key=None, offline=False):
+    """
+    Загружает JSON отчёта. С cache (ReportCache) повторная загрузка
+    ревалидируется по ETag/Last-Modified, а offline=True читает только кэш.
+    """
+    if cache is not None:
+        return cache.fetch(get_url, auth, key=key, offline=offline)
     resp = requests.get(get_url, auth=auth, headers={'Accept': 'application/json'})
     resp.raise_for_status()
     return resp.json()
@@ -115,33 +133,72 @@ def chunk_items(items: list[dict], chunk_size: int) -> list[str]:
 
 
 def build_index(chunks):
-    if SentenceTransformer is None or faiss is None:
+    """
+    Возвращает (нормированные эмбеддинги чанков, RetrievalEngine)
+    или (None, None), если модель эмбеддингов недоступна.
+    """
+    if SentenceTransformer is None:
         return None, None
     try:
-        model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-        embs = model.encode(chunks, convert_to_numpy=True)
-        index = faiss.IndexFlatL2(embs.shape[1])
-        index.add(embs)
-        return index, model
+        engine = RetrievalEngine(SentenceTransformer('paraphrase-MiniLM-L6-v2'))
+        return engine.index(chunks), engine
     except:
         return None, None
 
-def retrieve_chunks(query, chunks, index, model, top_k):
-    if index is None or model is None:
+def retrieve_chunks(query, chunks, index, engine, top_k):
+    """
+    Чанки, релевантные запросу и запросам-намерениям (failed, broken, flaky,
+    регрессии), без дубликатов (MMR). Порядок — порядок выбора MMR,
+    самые релевантные идут первыми.
+    """
+    if index is None or engine is None:
         return chunks[:top_k]
-    q_emb = model.encode([query], convert_to_numpy=True)
-    _, I = index.search(q_emb, top_k)
-    return [chunks[i] for i in I[0] if i < len(chunks)]
+    return engine.retrieve(chunks, index, queries=[query], top_k=top_k)
+
+def _remaining(deadline):
+    """Остаток до deadline (None — без ограничения); TimeoutError, если он вышел."""
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Время на ответ модели истекло")
+    return remaining
+
+
+def _abort_response(resp, aborted: threading.Event):
+    """
+    Обрывает стрим по таймеру. resp.close() не будит поток, заблокированный
+    в чтении сокета, поэтому сокет сначала закрывается через shutdown.
+    """
+    aborted.set()
+    sock = getattr(getattr(getattr(getattr(resp.raw, "_fp", None), "fp", None), "raw", None), "_sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    resp.close()
+
+
+def _is_read_timeout(error: Exception) -> bool:
+    # requests заворачивает read-таймаут внутри iter_lines в ConnectionError
+    return isinstance(error, requests.Timeout) or any(
+        isinstance(arg, ReadTimeoutError) for arg in error.args)
+
 
 def ask_model_stream(prompt: str,
                      context: str,
                      model_name: str = "gemma3:1b",
                      host: str = "localhost",
                      port: int = 11434,
-                     max_tokens: int = 2048) -> str:
+                     max_tokens: int = 2048,
+                     timeout: float = None) -> str:
     """
     Запрос к модели через ollama API в режиме streaming.
     Если стриминг не даёт данных, переходит на non-stream.
+    timeout — общий лимит времени (сек) на ответ; при превышении TimeoutError.
+    Таймаут requests ограничивает только паузу между байтами, поэтому общий
+    лимит держит таймер, обрывающий соединение в момент deadline.
     """
     print(f"[DEBUG] Длина контекста (символов): {len(context)}")
     # (debug сохраняем контекст в last_context.txt ...)
@@ -155,40 +212,66 @@ def ask_model_stream(prompt: str,
         "stream": True
     }
 
+    deadline = time.monotonic() + timeout if timeout is not None else None
     try:
-        resp = requests.post(url, json=payload, stream=True)
+        resp = requests.post(url, json=payload, stream=True, timeout=timeout)
         resp.raise_for_status()
+    except requests.Timeout:
+        raise
     except Exception:
         # при сбое стрима сразу на non-stream:
-        return ask_model_nonstream(prompt, context, model_name, host, port, max_tokens)
+        return ask_model_nonstream(prompt, context, model_name, host, port, max_tokens,
+                                   _remaining(deadline))
+
+    aborted = threading.Event()
+    timer = None
+    if deadline is not None:
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()),
+                                _abort_response, (resp, aborted))
+        timer.daemon = True
+        timer.start()
 
     full_response = ""
-    for line in resp.iter_lines(decode_unicode=True):
-        if not line or not line.strip().startswith("data:"):
-            continue
-        data_str = line.strip()[len("data:"):].strip()
-        try:
-            chunk = json.loads(data_str)
-            delta = chunk["choices"][0].get("delta", {})
-            content = delta.get("content", "")
-            full_response += content
-            print(content, end="", flush=True)
-        except json.JSONDecodeError:
-            continue
+    try:
+        for line in resp.iter_lines(decode_unicode=True):
+            if aborted.is_set() or (deadline is not None and time.monotonic() > deadline):
+                break
+            if not line or not line.strip().startswith("data:"):
+                continue
+            data_str = line.strip()[len("data:"):].strip()
+            try:
+                chunk = json.loads(data_str)
+                delta = chunk["choices"][0].get("delta", {})
+                content = delta.get("content", "")
+                full_response += content
+                print(content, end="", flush=True)
+            except json.JSONDecodeError:
+                continue
+    except requests.RequestException as e:
+        # зависший стрим — это таймаут, а не отказ бэкенда: пул не должен его исключать
+        if aborted.is_set() or _is_read_timeout(e):
+            raise TimeoutError(f"Модель {model_name} не уложилась в {timeout:.1f} с") from e
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
 
     print()  # перевод строки после стрима
+    if aborted.is_set() or (deadline is not None and time.monotonic() > deadline):
+        raise TimeoutError(f"Модель {model_name} не уложилась в {timeout:.1f} с")
 
     # **здесь** добавляем return при пустом ответе:
     if not full_response.strip():
         print("[DEBUG] Streaming вернул пустой ответ, пробую non-stream.")
-        return ask_model_nonstream(prompt, context, model_name, host, port, max_tokens)
+        return ask_model_nonstream(prompt, context, model_name, host, port, max_tokens,
+                                   _remaining(deadline))
 
     return full_response
 
 
 def ask_model_nonstream(prompt: str, context: str,
                          model_name: str, host: str, port: int,
-                         max_tokens: int) -> str:
+                         max_tokens: int, timeout: float = None) -> str:
     """
     Запрос к модели без стриминга, возвращает полный ответ.
     """
@@ -200,7 +283,7 @@ def ask_model_nonstream(prompt: str, context: str,
         "max_tokens": max_tokens,
         "temperature": 0.2
     }
-    resp = requests.post(url, json=payload)
+    resp = requests.post(url, json=payload, timeout=timeout)
     resp.raise_for_status()
     data = resp.json()
     return data["choices"][0].get("text", "").strip()
@@ -211,35 +294,57 @@ def main():
     group.add_argument('--uuid', help='Report UUID; requires GET_URL_BASE and POST_URL_BASE env vars')
     group.add_argument('--get-url', help='Full GET URL for report JSON')
     parser.add_argument('--post-url', help='Full POST URL for analysis')
-    parser.add_argument('--user', required=True)
-    parser.add_argument('--password', required=True)
+    parser.add_argument('--user')
+    parser.add_argument('--password')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Local cache of raw reports (REPORT_CACHE_DIR)')
+    parser.add_argument('--no-cache', action='store_true', help='Always download the full report')
+    parser.add_argument('--from-cache', action='store_true',
+                        help='Offline replay: read the report from the cache only and print the analysis instead of posting it')
     parser.add_argument('--chunk-size', type=int, default=128)
     parser.add_argument('--top-k', type=int, default=20)
     parser.add_argument('--model', default='gemma3:1b')
+    parser.add_argument('--fallback-model', default='gemma3:1b',
+                        help='Cheaper model used when the latency budget runs low')
+    parser.add_argument('--budget', type=float,
+                        default=float(os.getenv('ANALYSIS_BUDGET_SECONDS', 0)) or None,
+                        help='Latency budget in seconds for the whole run (default: unlimited)')
     parser.add_argument('--host', default='localhost')
     parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--hosts', default=os.getenv('MODEL_HOSTS'),
+                        help='Comma-separated Ollama backends host:port[=model|model]; overrides --host/--port')
     parser.add_argument('--max-tokens', type=int, default=2048)
     args = parser.parse_args()
 
+    if args.from_cache and args.no_cache:
+        parser.error('--from-cache and --no-cache are mutually exclusive')
+    if not args.from_cache and (not args.user or not args.password):
+        parser.error('--user and --password are required unless --from-cache is used')
+
     auth = (args.user, args.password)
+    budget = LatencyBudget(args.budget)
+    cache = None if args.no_cache else ReportCache(args.cache_dir)
 
     if args.uuid:
-        base_get = os.getenv('GET_URL_BASE')
-        base_post = os.getenv('POST_URL_BASE')
-        if not base_get or not base_post:
+        uuid = args.uuid
+        cache_key = uuid
+        base_get = os.getenv('GET_URL_BASE', '')
+        base_post = os.getenv('POST_URL_BASE', '')
+        if not args.from_cache and (not base_get or not base_post):
             print('Error: GET_URL_BASE and POST_URL_BASE must be set when using --uuid', file=sys.stderr)
             sys.exit(1)
-        uuid = args.uuid
         get_url = f"{base_get}/{uuid}/suites/json"
         post_url = f"{base_post}/{uuid}"
     else:
         get_url = args.get_url
         post_url = args.post_url
-        if not post_url:
+        cache_key = None
+        if not post_url and not args.from_cache:
             print('Error: --post-url is required when using --get-url', file=sys.stderr)
             sys.exit(1)
 
-    report = load_report_from_api(get_url, auth)
+    with budget.stage('fetch'):
+        report = load_report_from_api(get_url, auth, cache, cache_key, offline=args.from_cache)
     items = flatten_report(report)
 
     cnt = Counter(it['status'] for it in items)
@@ -250,23 +355,53 @@ def main():
     intro = f"failed: {failed}, broken: {broken}, flaky: {flaky}, passed: {passed}"
 
     chunks = chunk_items(items, args.chunk_size)
-    index, embed_model = build_index(chunks)
-
+    tiers = build_tiers(args.model, args.fallback_model, args.top_k)
     date_str = datetime.now().strftime('%Y-%m-%d')
     prompt_main = f"Общий анализ результатов тестирования за {date_str} и рекомендации."
-    query = intro + ' | ' + prompt_main
-    top_chunks = retrieve_chunks(query, chunks, index, embed_model, args.top_k)
-    context = '\n'.join(top_chunks)
-
-    analysis = ask_model_stream(
-        prompt_main, context,
-        args.model, args.host, args.port, args.max_tokens
-    )
+    # запрос для поиска — по-английски, как и модель эмбеддингов
+    query = f"{intro} | overall test run analysis and recommendations"
+
+    top_chunks = []
+    # если бюджета не хватает даже на сокращённый уровень, сразу отдаём статистику
+    if budget.remaining() >= tiers[-1].min_seconds:
+        with budget.stage('encode'):
+            index, embed_model = build_index(chunks)
+        with budget.stage('retrieval'):
+            top_chunks = retrieve_chunks(query, chunks, index, embed_model, args.top_k)
+
+    pool = None
+    if args.hosts:
+        pool = ModelBackendPool.from_spec(args.hosts)
+        pool.probe_all()
+
+    def generate(tier, timeout):
+        # чанки отсортированы по релевантности — для сокращённых уровней берём начало
+        context = '\n'.join(top_chunks[:tier.top_k])
+        if pool is None:
+            return ask_model_stream(prompt_main, context, tier.model,
+                                    args.host, args.port, args.max_tokens, timeout)
+
+        def ask(backend):
+            print(f"[DEBUG] Бэкенд модели: {backend.url}")
+            return ask_model_stream(prompt_main, context, tier.model,
+                                    backend.host, backend.port, args.max_tokens, timeout)
+
+        # при ошибке соединения запрос уходит на следующий бэкенд
+        return pool.call(ask, model=tier.model)
+
+    analysis, tier_name = run_tiers(budget, tiers if top_chunks else [], generate,
+                                    lambda: stats_summary(cnt))
+    timings = ', '.join(f"{k}={v:.2f}s" for k, v in budget.stages.items())
+    print(f"[DEBUG] Уровень анализа: {tier_name}; {timings}")
 
     payload_list = [{
         'rule': date_str,
-        'message': intro + '\n\n' + analysis
+        'message': f"{intro}\n[tier: {tier_name}]\n\n{analysis}"
     }]
+    if args.from_cache:
+        # offline-режим: в Allure ничего не отправляем
+        print(payload_list[0]['message'])
+        return
     resp = send_analysis_to_api(post_url, auth, payload_list)
     print(f"Posted analysis, HTTP {resp.status_code}")
 
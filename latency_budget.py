@@ -0,0 +1,128 @@
+"""
+latency_budget.py: бюджет времени на один анализ и деградация по уровням.
+
+Бюджет учитывает все стадии (загрузка, кодирование, поиск, генерация).
+Когда времени остаётся мало, анализ переходит на более дешёвый уровень:
+  full    — основная модель, полный контекст
+  small   — лёгкая модель (gemma3:1b), полный контекст
+  reduced — лёгкая модель, меньше чанков
+  stats   — только статистика по статусам, без обращения к модели
+"""
+
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+# Минимальный остаток бюджета (сек), при котором имеет смысл пробовать уровень
+FULL_MIN_SECONDS = 30.0
+SMALL_MIN_SECONDS = 10.0
+REDUCED_MIN_SECONDS = 3.0
+STATS_TIER = "stats"
+
+
+class LatencyBudget:
+    """Отсчитывает время от создания; seconds=None — бюджет не ограничен."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.stages: dict = {}
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return float("inf")
+        return max(0.0, self.seconds - self.elapsed())
+
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self) -> Optional[float]:
+        """Таймаут для HTTP-запроса: остаток бюджета или None без ограничения."""
+        remaining = self.remaining()
+        return None if remaining == float("inf") else remaining
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.monotonic() - started
+
+
+class Tier:
+    def __init__(self, name: str, model: Optional[str], top_k: int, min_seconds: float):
+        self.name = name
+        self.model = model
+        self.top_k = top_k
+        self.min_seconds = min_seconds
+
+    def __repr__(self):
+        return f"Tier({self.name}, model={self.model}, top_k={self.top_k})"
+
+
+def build_tiers(model: str, fallback_model: str, top_k: int,
+                reduced_top_k: Optional[int] = None) -> List[Tier]:
+    """Лестница уровней от самого дорогого к самому дешёвому (без stats)."""
+    reduced_top_k = reduced_top_k or max(1, top_k // 4)
+    tiers = [Tier("full", model, top_k, FULL_MIN_SECONDS)]
+    if fallback_model != model:
+        tiers.append(Tier("small", fallback_model, top_k, SMALL_MIN_SECONDS))
+    if reduced_top_k < top_k:
+        tiers.append(Tier("reduced", fallback_model, reduced_top_k, REDUCED_MIN_SECONDS))
+    return tiers
+
+
+def run_tiers(budget: LatencyBudget,
+              tiers: List[Tier],
+              generate: Callable[[Tier, Optional[float]], str],
+              fallback: Callable[[], str]) -> Tuple[str, str]:
+    """
+    Пробует уровни по порядку, пропуская те, на которые не хватает бюджета.
+    generate(tier, timeout) получает остаток бюджета за вычетом min_seconds
+    следующего уровня: если модель зависнет, на более дешёвый уровень
+    останется время. Если ни один уровень не дал ответа, возвращает
+    fallback() с уровнем stats.
+    """
+    reserved = False
+    for i, tier in enumerate(tiers):
+        remaining = budget.remaining()
+        # уровень, под который предыдущий оставил резерв, пробуем даже если
+        # накладные расходы съели долю секунды из его min_seconds
+        if remaining < tier.min_seconds and not (reserved and remaining > 0):
+            continue
+        reserved = False
+        timeout = budget.timeout()
+        if timeout is not None and i + 1 < len(tiers):
+            reserve = tiers[i + 1].min_seconds
+            if remaining > reserve:
+                timeout = remaining - reserve
+                reserved = True
+        try:
+            with budget.stage(f"generation:{tier.name}"):
+                result = generate(tier, timeout)
+            if result and result.strip():
+                return result, tier.name
+        except Exception as e:
+            print(f"⚠️ Уровень {tier.name} не уложился в бюджет или упал: {e}")
+    return fallback(), STATS_TIER
+
+
+def stats_summary(counts: Counter) -> str:
+    """Сводка без модели: распределение статусов тестов."""
+    total = sum(counts.values())
+    if not total:
+        return "Нет результатов тестов для анализа."
+    lines = [f"Всего тестов: {total}"]
+    for status, n in counts.most_common():
+        lines.append(f"- {status}: {n} ({n * 100 / total:.1f}%)")
+    problems = sum(counts.get(s, 0) for s in ("failed", "broken", "flaky"))
+    if problems:
+        lines.append(f"Требуют внимания: {problems} тест(ов) в статусах failed/broken/flaky.")
+    else:
+        lines.append("Проблемных тестов не обнаружено.")
+    return "\n".join(lines)
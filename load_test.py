@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""
+load_test.py: offline load test for main_api (/analyze) and uuid_service (/uuid).
+
+Starts local stub Allure (serves synthetic suites JSON, accepts analysis POSTs)
+and stub Ollama (/api/tags, /api/generate, /v1/completions with configurable
+latency and token rate, streaming and non-streaming), spawns the service under
+test pointed at the stubs, drives it at a fixed concurrency or arrival rate and
+reports throughput, p50/p95/p99 latency, error rate and process memory.
+
+Usage:
+  # /analyze, 8 concurrent clients, 200 requests:
+  python load_test.py analyze --concurrency 8 --requests 200
+
+  # /uuid at 2 req/s for 60 s; latency is measured until the analysis is posted to Allure:
+  python load_test.py uuid --rate 2 --duration 60
+
+  # Release gate: non-zero exit code if limits are exceeded
+  python load_test.py analyze --max-p95 5 --max-error-rate 0.01 --json result.json
+
+  # Drive an already running service instead of spawning one; start it with the
+  # settings printed by the load test (MODEL_HOSTS, GET_URL_BASE, POST_URL_BASE, ...):
+  python load_test.py analyze --target http://localhost:8000 --allure-port 18101 --ollama-port 18102
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid as uuid_lib
+import zlib
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+APP_DIR = Path(__file__).resolve().parent
+STATUSES = ["passed", "failed", "broken", "skipped", "flaky"]
+
+
+# ---------- synthetic data ----------
+
+def synthetic_report(team: str = "Load team", n_tests: int = 200,
+                     failure_rate: float = 0.1, seed=None) -> dict:
+    """Allure suites JSON: suites -> team -> features -> tests."""
+    rng = random.Random(seed)
+    features = []
+    for i in range(n_tests):
+        f, t = divmod(i, 20)
+        if t == 0:
+            features.append({"name": f"Feature {f}", "children": []})
+        failed = rng.random() < failure_rate
+        status = rng.choice(STATUSES[1:]) if failed else "passed"
+        test = {"name": f"test_{f}_{t}", "status": status, "uid": f"{f}-{t}"}
+        if status in ("failed", "broken"):
+            test["message"] = rng.choice(["Timeout error", "Connection refused",
+                                          "AssertionError: expected 200", "NullPointerException"])
+        features[-1]["children"].append(test)
+    return {"uid": "suites", "name": "suites", "children": [{"name": team, "children": features}]}
+
+
+# ---------- stub servers ----------
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class StubServer:
+    """ThreadingHTTPServer in a background thread."""
+
+    handler = _StubHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = ThreadingHTTPServer((host, port), self.handler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _AllureHandler(_StubHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        parts = self.path.strip("/").split("/")
+        # /api/report/<uuid>/suites/json
+        if len(parts) == 5 and parts[:2] == ["api", "report"] and parts[3:] == ["suites", "json"]:
+            report_uuid = parts[2]
+            stub.fetched.add(report_uuid)
+            self._send_json(stub.report_for(report_uuid))
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        stub = self.server.stub
+        parts = self.path.strip("/").split("/")
+        # /api/analysis/report/<uuid>
+        if len(parts) == 4 and parts[:3] == ["api", "analysis", "report"]:
+            stub.record_analysis(parts[3], self._body())
+            self._send_json({"status": "ok"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+
+class StubAllure(StubServer):
+    """Serves a synthetic report for any UUID and records analysis POSTs."""
+
+    handler = _AllureHandler
+
+    def __init__(self, n_tests: int = 200, failure_rate: float = 0.1, teams: int = 4, **kwargs):
+        super().__init__(**kwargs)
+        self.n_tests = n_tests
+        self.failure_rate = failure_rate
+        self.teams = teams
+        self.fetched = set()
+        self.analyses = {}
+        self._events = {}
+        self._lock = threading.Lock()
+
+    @property
+    def get_url_base(self) -> str:
+        return f"{self.url}/api/report"
+
+    @property
+    def post_url_base(self) -> str:
+        return f"{self.url}/api/analysis/report"
+
+    def report_for(self, report_uuid: str) -> dict:
+        seed = zlib.crc32(report_uuid.encode("utf-8"))
+        team = f"Load team {seed % self.teams}"
+        return synthetic_report(team, self.n_tests, self.failure_rate, seed)
+
+    def _event(self, report_uuid: str) -> threading.Event:
+        with self._lock:
+            return self._events.setdefault(report_uuid, threading.Event())
+
+    def record_analysis(self, report_uuid: str, payload):
+        self.analyses[report_uuid] = payload
+        self._event(report_uuid).set()
+
+    def wait_analysis(self, report_uuid: str, timeout: float) -> bool:
+        return self._event(report_uuid).wait(timeout)
+
+
+class _OllamaHandler(_StubHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path.rstrip("/") == "/api/tags":
+            self._send_json({"models": [{"name": m} for m in stub.models]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        stub = self.server.stub
+        payload = self._body()
+        stub.count_request()
+        path = self.path.rstrip("/")
+        if path not in ("/api/generate", "/v1/completions"):
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        time.sleep(stub.latency)
+        # like Ollama: /api/generate streams by default, the OpenAI-compatible API does not
+        stream = bool(payload.get("stream", path == "/api/generate"))
+        tokens = stub.tokens()
+        if not stream:
+            time.sleep(len(tokens) / stub.tokens_per_second)
+            text = "".join(tokens)
+            if path == "/api/generate":
+                self._send_json({"model": payload.get("model"), "response": text, "done": True})
+            else:
+                self._send_json({"choices": [{"text": text, "finish_reason": "stop"}]})
+            return
+
+        if path == "/api/generate":
+            self._start_chunked("application/x-ndjson")
+            for tok in tokens:
+                time.sleep(1 / stub.tokens_per_second)
+                self._chunk(json.dumps({"response": tok, "done": False}).encode() + b"\n")
+            self._chunk(json.dumps({"response": "", "done": True}).encode() + b"\n")
+        else:
+            self._start_chunked("text/event-stream; charset=utf-8")
+            for tok in tokens:
+                time.sleep(1 / stub.tokens_per_second)
+                chunk = {"choices": [{"delta": {"content": tok}}]}
+                self._chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self._chunk(b"data: [DONE]\n\n")
+        self._end_chunked()
+
+
+class StubOllama(StubServer):
+    """Ollama stub with fixed first-token latency and token rate."""
+
+    handler = _OllamaHandler
+
+    def __init__(self, latency: float = 0.05, tokens_per_second: float = 200.0,
+                 response_tokens: int = 32, models=("gemma3:1b", "gemma3:4b"), **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.models = list(models)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        # handlers run in ThreadingHTTPServer threads
+        with self._lock:
+            self.requests += 1
+
+    def tokens(self):
+        return [f"tok{i} " for i in range(self.response_tokens)]
+
+
+# ---------- load driver ----------
+
+def percentile(values, q: float):
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_load(send, concurrency: int = 4, rate: float = None,
+             total: int = None, duration: float = None) -> dict:
+    """
+    Calls send(i) repeatedly; send returns True on success or raises.
+    Closed loop: `concurrency` workers back to back.
+    Open loop: Poisson arrivals at `rate` req/s, up to `concurrency` in flight;
+    latency is counted from the scheduled arrival, so queueing is included.
+    Stops after `total` requests or `duration` seconds.
+    """
+    if total is None and duration is None:
+        total = 100
+    latencies, errors = [], {}
+    lock = threading.Lock()
+    counter = iter(range(10 ** 12))
+    started = time.perf_counter()
+
+    def one(i, t0=None):
+        t0 = t0 or time.perf_counter()
+        try:
+            ok = send(i)
+            err = None if ok else "failed"
+        except Exception as e:
+            err = type(e).__name__
+        elapsed = time.perf_counter() - t0
+        with lock:
+            if err:
+                errors[err] = errors.get(err, 0) + 1
+            else:
+                latencies.append(elapsed)
+
+    def more():
+        if duration is not None and time.perf_counter() - started >= duration:
+            return None
+        with lock:
+            i = next(counter)
+        return i if total is None or i < total else None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        if rate:
+            rng = random.Random(0)
+            next_at = started
+            futures = []
+            while (i := more()) is not None:
+                next_at += rng.expovariate(rate)
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+                futures.append(ex.submit(one, i, next_at))
+            for f in futures:
+                f.result()
+        else:
+            def worker():
+                while (i := more()) is not None:
+                    one(i)
+            for f in [ex.submit(worker) for _ in range(concurrency)]:
+                f.result()
+
+    wall = time.perf_counter() - started
+    done = len(latencies) + sum(errors.values())
+    return {
+        "requests": done,
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": (done - len(latencies)) / done if done else 0.0,
+        "duration_s": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+    }
+
+
+# ---------- process memory ----------
+
+def _proc_status(pid: int) -> dict:
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                fields[key] = value.strip()
+    except OSError:
+        pass
+    return fields
+
+
+def _children(pid: int):
+    result = []
+    for entry in Path("/proc").glob("[0-9]*"):
+        if _proc_status(int(entry.name)).get("PPid") == str(pid):
+            result.append(int(entry.name))
+    return result
+
+
+def process_tree_rss_mb(pid: int):
+    """RSS of a process and all its descendants in MB (Linux /proc), or None."""
+    if not Path(f"/proc/{pid}").exists():
+        return None
+    total_kb, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        rss = _proc_status(current).get("VmRSS", "0 kB").split()[0]
+        total_kb += int(rss)
+        stack.extend(_children(current))
+    return total_kb / 1024
+
+
+class MemorySampler:
+    """Samples process-tree RSS in the background, keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb = None
+        self.last_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = process_tree_rss_mb(self.pid)
+            if rss is not None:
+                self.last_mb = rss
+                self.peak_mb = max(self.peak_mb or 0.0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+
+# ---------- services under test ----------
+
+def wait_http(url: str, timeout: float = 120.0, proc=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Service exited with code {proc.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up in {timeout:.0f}s")
+
+
+def stub_env(allure: StubAllure, ollama: StubOllama) -> dict:
+    """Settings that point a service (spawned or external) at the stubs."""
+    return {
+        "MODEL_HOSTS": ollama.url,
+        "GET_URL_BASE": allure.get_url_base,
+        "POST_URL_BASE": allure.post_url_base,
+        "ALLURE_USER": "load",
+        "ALLURE_PASS": "load",
+    }
+
+
+def spawn_service(kind: str, port: int, allure: StubAllure, ollama: StubOllama,
+                  workdir: Path) -> subprocess.Popen:
+    env = os.environ.copy()
+    env.update(stub_env(allure, ollama))
+    env.update({
+        "VECTOR_STORE_DIR": str(workdir / "vector_store"),
+        "REPORT_CACHE_DIR": str(workdir / "report_cache"),
+        "UUID_FILE": str(workdir / "last_uuid.txt"),
+        "DAILY_REPORT_SCRIPT": str(APP_DIR / "daily_report.py"),
+        "UUID_SERVICE_PORT": str(port),
+    })
+    # no network: the embedding models must already be in the local HF cache
+    # (or HF_HOME / SENTENCE_TRANSFORMERS_HOME must point at a local copy)
+    env.setdefault("HF_HUB_OFFLINE", "1")
+    env.setdefault("TRANSFORMERS_OFFLINE", "1")
+    if kind == "analyze":
+        cmd = [sys.executable, "-m", "uvicorn", "main_api:app",
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "uuid_service.py"]
+    return subprocess.Popen(cmd, cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_sender(kind: str, target: str, allure: StubAllure, args):
+    if kind == "analyze":
+        def send(i):
+            report_uuid = str(uuid_lib.uuid4())
+            body = {"uuid": report_uuid, "report": allure.report_for(report_uuid)}
+            if args.budget:
+                body["budget_seconds"] = args.budget
+            resp = requests.post(f"{target}/analyze", json=body, timeout=args.timeout)
+            resp.raise_for_status()
+            return True
+        return send
+
+    def send(i):
+        report_uuid = str(uuid_lib.uuid4())
+        resp = requests.post(f"{target}/uuid", json={"uuid": report_uuid}, timeout=args.timeout)
+        resp.raise_for_status()
+        if args.no_wait:
+            return True
+        # end-to-end: until the analysis is posted back to (stub) Allure
+        return allure.wait_analysis(report_uuid, args.timeout)
+    return send
+
+
+def format_summary(kind: str, result: dict) -> str:
+    lat = result["latency_s"]
+
+    def ms(v):
+        return "-" if v is None else f"{v * 1000:.0f} ms"
+
+    lines = [
+        f"Endpoint:      /{kind}",
+        f"Requests:      {result['requests']} ({result['ok']} ok)",
+        f"Error rate:    {result['error_rate'] * 100:.2f}% {result['errors'] or ''}".rstrip(),
+        f"Throughput:    {result['throughput_rps']:.2f} req/s",
+        f"Latency:       p50 {ms(lat['p50'])}, p95 {ms(lat['p95'])}, p99 {ms(lat['p99'])}, max {ms(lat['max'])}",
+    ]
+    mem = result.get("memory_mb")
+    if mem:
+        lines.append(f"Memory (RSS):  peak {mem['peak']:.0f} MB, end {mem['end']:.0f} MB")
+    return "\n".join(lines)
+
+
+def check_gates(result: dict, max_p95=None, max_error_rate=None, min_throughput=None):
+    failures = []
+    p95 = result["latency_s"]["p95"]
+    if max_p95 is not None and (p95 is None or p95 > max_p95):
+        failures.append(f"p95 {p95} s > {max_p95} s")
+    if max_error_rate is not None and result["error_rate"] > max_error_rate:
+        failures.append(f"error rate {result['error_rate']:.3f} > {max_error_rate}")
+    if min_throughput is not None and result["throughput_rps"] < min_throughput:
+        failures.append(f"throughput {result['throughput_rps']:.2f} < {min_throughput} req/s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for /analyze and /uuid")
+    parser.add_argument('endpoint', choices=['analyze', 'uuid'])
+    parser.add_argument('--target', help='URL of a running service; by default one is spawned')
+    parser.add_argument('--port', type=int, default=18000, help='Port for the spawned service')
+    parser.add_argument('--allure-port', type=int, default=0,
+                        help='Fixed stub Allure port, so a --target service can be configured for it')
+    parser.add_argument('--ollama-port', type=int, default=0,
+                        help='Fixed stub Ollama port, so a --target service can be configured for it')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, help='Open-loop arrival rate, req/s')
+    parser.add_argument('--requests', type=int, help='Total requests (default 100 unless --duration)')
+    parser.add_argument('--duration', type=float, help='Test duration, s')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Per-request timeout, s')
+    parser.add_argument('--budget', type=float, help='budget_seconds sent to /analyze')
+    parser.add_argument('--no-wait', action='store_true',
+                        help='/uuid: measure only the HTTP response, not the posted analysis')
+    parser.add_argument('--report-tests', type=int, default=200, help='Tests per synthetic report')
+    parser.add_argument('--failure-rate', type=float, default=0.1)
+    parser.add_argument('--teams', type=int, default=4)
+    parser.add_argument('--ollama-latency', type=float, default=0.2, help='Stub first-token latency, s')
+    parser.add_argument('--ollama-tps', type=float, default=50.0, help='Stub tokens per second')
+    parser.add_argument('--ollama-tokens', type=int, default=64, help='Stub tokens per response')
+    parser.add_argument('--max-p95', type=float, help='Gate: max p95 latency, s')
+    parser.add_argument('--max-error-rate', type=float, help='Gate: max error rate (0..1)')
+    parser.add_argument('--min-throughput', type=float, help='Gate: min throughput, req/s')
+    parser.add_argument('--json', help='Write the result as JSON to this file')
+    args = parser.parse_args(argv)
+
+    if args.target and args.endpoint == "uuid" and not (args.no_wait or args.allure_port):
+        # the analysis would be posted to the service's own Allure, never to the stub
+        parser.error("--target with uuid needs --allure-port (service configured for the stub) "
+                     "or --no-wait")
+
+    allure = StubAllure(args.report_tests, args.failure_rate, args.teams,
+                        port=args.allure_port).start()
+    ollama = StubOllama(args.ollama_latency, args.ollama_tps, args.ollama_tokens,
+                        port=args.ollama_port).start()
+    print(f"Stub Allure: {allure.url}, stub Ollama: {ollama.url}")
+    if args.target:
+        print("Configure the target service for the stubs: "
+              + " ".join(f"{k}={v}" for k, v in stub_env(allure, ollama).items()))
+        if args.endpoint == "analyze" and not args.ollama_port:
+            print("WARNING: without --ollama-port the target service uses its own model backend",
+                  file=sys.stderr)
+
+    proc = None
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        try:
+            target = args.target
+            if not target:
+                proc = spawn_service(args.endpoint, args.port, allure, ollama, Path(workdir))
+                target = f"http://127.0.0.1:{args.port}"
+                wait_http(f"{target}/", proc=proc)
+
+            send = make_sender(args.endpoint, target, allure, args)
+            sampler = MemorySampler(proc.pid) if proc else None
+            with sampler or nullcontext():
+                result = run_load(send, args.concurrency, args.rate, args.requests, args.duration)
+            if sampler and sampler.peak_mb is not None:
+                result["memory_mb"] = {"peak": sampler.peak_mb, "end": sampler.last_mb}
+            result["ollama_requests"] = ollama.requests
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait(timeout=10)
+            allure.stop()
+            ollama.stop()
+
+    print(format_summary(args.endpoint, result))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    failures = check_gates(result, args.max_p95, args.max_error_rate, args.min_throughput)
+    for failure in failures:
+        print(f"GATE FAILED: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
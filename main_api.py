@@ -1,23 +1,43 @@
+import os
+from typing import Optional
 from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from report_storage_manager import extract_team_name, sanitize_folder_name
 from vectorizer import vectorize_report
-from analyzer import analyze_team_reports
+from analyzer import analyze_team_reports_tiered, model_pool
+from latency_budget import LatencyBudget
 
 app = FastAPI()
 
+@app.on_event("startup")
+def start_model_pool():
+    # периодически проверяем бэкенды Ollama и возвращаем восстановившиеся в пул
+    model_pool.probe_all()
+    model_pool.start_probing()
+
+# Бюджет по умолчанию на один запрос /analyze (сек); 0 — без ограничения
+DEFAULT_BUDGET_SECONDS = float(os.getenv("ANALYZE_BUDGET_SECONDS", 0)) or None
+
 class ReportInput(BaseModel):
     uuid: str
     report: dict
+    budget_seconds: Optional[float] = None
 
 @app.post("/analyze")
 def analyze_report(payload: ReportInput):
+    budget = LatencyBudget(payload.budget_seconds or DEFAULT_BUDGET_SECONDS)
     try:
         team_name = extract_team_name(payload.report)
         folder_name = sanitize_folder_name(team_name)
-        vectorize_report(payload.report, folder_name)
-        summary = analyze_team_reports(folder_name)
-        return {"team": team_name, "summary": summary}
+        with budget.stage("encode"):
+            vectorize_report(payload.report, folder_name)
+        summary, tier = analyze_team_reports_tiered(folder_name, budget)
+        return {
+            "team": team_name,
+            "summary": summary,
+            "tier": tier,
+            "timings": {k: round(v, 3) for k, v in budget.stages.items()},
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
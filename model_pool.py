@@ -0,0 +1,274 @@
+"""
+model_pool.py: пул Ollama-бэкендов с балансировкой нагрузки.
+
+Формат списка эндпоинтов (переменная MODEL_HOSTS или аргумент --hosts):
+  host1:11434,host2:11434=gemma3:4b,http://host3:11434=gemma3:1b|gemma3:4b
+
+После "=" через "|" перечисляются модели, которые обслуживает бэкенд.
+Если модели не указаны, они берутся из ответа /api/tags при health-проверке.
+"""
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional, TypeVar
+
+import requests
+
+T = TypeVar("T")
+
+
+class Backend:
+    """Один Ollama-бэкенд и его текущее состояние в пуле."""
+
+    def __init__(self, url: str, models: Optional[Iterable[str]] = None):
+        if "://" not in url:
+            url = f"http://{url}"
+        self.url = url.rstrip("/")
+        hostport = self.url.split("://", 1)[1].split("/", 1)[0]
+        host, _, port = hostport.partition(":")
+        self.host = host
+        self.port = int(port) if port else 11434
+        # модели, заданные вручную, имеют приоритет над найденными через /api/tags
+        self.static_models = set(models or [])
+        self.discovered_models: set = set()
+        self.outstanding = 0
+        self.failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        # пробный запрос к исключённому бэкенду после истечения ejected_until
+        self.trial = False
+
+    @property
+    def models(self) -> set:
+        return self.static_models or self.discovered_models
+
+    def serves(self, model: Optional[str]) -> bool:
+        return model is None or not self.models or model in self.models
+
+    def __repr__(self):
+        state = "up" if self.healthy else "down"
+        return f"Backend({self.url}, {state}, outstanding={self.outstanding})"
+
+
+def parse_endpoints(spec: str) -> List[Backend]:
+    """Разбирает строку вида "host:port[=model|model],..." в список бэкендов."""
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, models = item.partition("=")
+        backends.append(Backend(url.strip(), [m.strip() for m in models.split("|") if m.strip()]))
+    return backends
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+class ModelBackendPool:
+    """
+    Пул бэкендов: маршрутизация по наименьшему числу незавершённых запросов,
+    health-проверки через /api/tags, исключение сбойных бэкендов и возврат их
+    в пул после успешной проверки или успешного пробного запроса.
+
+    Исключённый бэкенд по истечении eject_seconds получает ровно один пробный
+    запрос; при неудаче он сразу исключается снова.
+    """
+
+    def __init__(self, backends: List[Backend],
+                 max_failures: int = 3,
+                 eject_seconds: float = 30.0,
+                 probe_timeout: float = 2.0):
+        if not backends:
+            raise ValueError("Пул бэкендов не может быть пустым")
+        self.backends = backends
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        # случайный старт: одноразовые пулы (по пулу на запуск daily_report)
+        # не должны все начинать с первого бэкенда
+        self._rr = random.randrange(len(backends))
+        self._prober = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_spec(cls, spec: str, **kwargs) -> "ModelBackendPool":
+        return cls(parse_endpoints(spec), **kwargs)
+
+    @classmethod
+    def from_env(cls, default_host: str = "localhost", default_port: str = "11434",
+                 **kwargs) -> "ModelBackendPool":
+        """MODEL_HOSTS, иначе OLLAMA_API_URL, иначе MODEL_HOST:MODEL_PORT."""
+        spec = os.getenv("MODEL_HOSTS") or os.getenv("OLLAMA_API_URL")
+        if not spec:
+            host = os.getenv("MODEL_HOST", default_host)
+            port = os.getenv("MODEL_PORT", default_port)
+            spec = f"{host}:{port}"
+        return cls.from_spec(spec, **kwargs)
+
+    # ---------- выбор бэкенда ----------
+
+    def _candidates(self, model: Optional[str], exclude=()) -> List[Backend]:
+        now = time.monotonic()
+        alive = [b for b in self.backends
+                 if b not in exclude
+                 and (b.healthy or (b.ejected_until <= now and not b.trial))]
+        if not alive:
+            return []
+        matching = [b for b in alive if b.serves(model)]
+        # если модель нигде не объявлена, пробуем любой живой бэкенд
+        return matching or alive
+
+    def acquire(self, model: Optional[str] = None, exclude=()) -> Backend:
+        """exclude — бэкенды, которые не выбирать (например, уже опробованные)."""
+        with self._lock:
+            candidates = self._candidates(model, exclude)
+            if not candidates:
+                raise NoBackendAvailable("Нет доступных бэкендов модели")
+            least = min(b.outstanding for b in candidates)
+            tied = [b for b in candidates if b.outstanding == least]
+            # при равной загрузке чередуем бэкенды по кругу
+            backend = tied[self._rr % len(tied)]
+            self._rr += 1
+            backend.outstanding += 1
+            if not backend.healthy:
+                backend.trial = True
+            return backend
+
+    def release(self, backend: Backend, ok: bool = True):
+        with self._lock:
+            backend.outstanding = max(0, backend.outstanding - 1)
+            backend.trial = False
+            if ok:
+                if not backend.healthy:
+                    print(f"✅ Бэкенд {backend.url} возвращён в пул")
+                backend.failures = 0
+                backend.healthy = True
+            else:
+                self._mark_failure(backend)
+
+    def _mark_failure(self, backend: Backend):
+        backend.failures += 1
+        if backend.failures >= self.max_failures or not backend.healthy:
+            if backend.healthy:
+                print(f"⚠️ Бэкенд {backend.url} исключён из пула")
+            backend.healthy = False
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    @contextmanager
+    def lease(self, model: Optional[str] = None, exclude=()):
+        """Контекстный менеджер: выдаёт бэкенд и учитывает результат запроса."""
+        backend = self.acquire(model, exclude)
+        ok = False
+        try:
+            yield backend
+            ok = True
+        except requests.HTTPError as e:
+            # 4xx — ошибка запроса, а не бэкенда
+            status = e.response.status_code if e.response is not None else 500
+            ok = status < 500
+            raise
+        except requests.ConnectionError:
+            # включая ConnectTimeout: бэкенд недоступен
+            raise
+        except (requests.Timeout, TimeoutError):
+            # таймаут задаётся бюджетом запроса: медленный бэкенд не считаем сбойным,
+            # но и пробный запрос к исключённому бэкенду успешным не считаем
+            ok = backend.healthy
+            raise
+        finally:
+            self.release(backend, ok)
+
+    def call(self, fn: Callable[[Backend], T], model: Optional[str] = None,
+             retries: Optional[int] = None) -> T:
+        """
+        fn(backend) на наименее загруженном бэкенде; при ошибке соединения
+        или 5xx — на следующем, ещё не опробованном (сбойный бэкенд отвечает
+        быстро и остаётся наименее загруженным, поэтому его исключаем явно).
+        Таймаут не повторяется: время уже израсходовано.
+        """
+        attempts = len(self.backends) if retries is None else retries + 1
+        last_error = None
+        tried = set()
+        for _ in range(attempts):
+            try:
+                with self.lease(model, exclude=tried) as backend:
+                    tried.add(backend)
+                    return fn(backend)
+            except NoBackendAvailable:
+                if last_error is not None:
+                    raise last_error
+                raise
+            except requests.ConnectionError as e:
+                last_error = e
+            except requests.Timeout:
+                raise
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code < 500:
+                    raise
+                last_error = e
+        raise last_error or NoBackendAvailable("Нет доступных бэкендов модели")
+
+    def post(self, path: str, model: Optional[str] = None, retries: Optional[int] = None,
+             **kwargs) -> requests.Response:
+        """POST на наименее загруженный бэкенд с переходом на следующий (см. call)."""
+        def send(backend):
+            resp = requests.post(f"{backend.url}{path}", **kwargs)
+            resp.raise_for_status()
+            return resp
+
+        return self.call(send, model, retries)
+
+    # ---------- health-проверки ----------
+
+    def probe(self, backend: Backend) -> bool:
+        try:
+            resp = requests.get(f"{backend.url}/api/tags", timeout=self.probe_timeout)
+            resp.raise_for_status()
+            tags = resp.json().get("models", [])
+        except Exception:
+            # явная проверка не прошла — исключаем сразу, не дожидаясь max_failures
+            with self._lock:
+                if backend.healthy:
+                    print(f"⚠️ Бэкенд {backend.url} не прошёл проверку и исключён из пула")
+                backend.healthy = False
+                backend.failures = max(backend.failures + 1, self.max_failures)
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+            return False
+        with self._lock:
+            backend.discovered_models = {m.get("name") for m in tags if m.get("name")}
+            if not backend.healthy:
+                print(f"✅ Бэкенд {backend.url} возвращён в пул")
+            backend.healthy = True
+            backend.failures = 0
+        return True
+
+    def probe_all(self) -> int:
+        """Проверяет все бэкенды, возвращает число здоровых."""
+        return sum(self.probe(b) for b in self.backends)
+
+    def start_probing(self, interval: float = 10.0):
+        if self._prober is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.probe_all()
+
+        self._prober = threading.Thread(target=loop, daemon=True)
+        self._prober.start()
+
+    def stop_probing(self):
+        self._stop.set()
+        if self._prober is not None:
+            self._prober.join(timeout=1)
+            self._prober = None
+
+    def healthy_backends(self) -> List[Backend]:
+        return [b for b in self.backends if b.healthy]
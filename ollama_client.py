@@ -1,15 +1,22 @@
 import requests
 
 class OllamaLLM:
-    def __init__(self, model="gemma:4b", host="http://localhost:11434"):
+    def __init__(self, model="gemma:4b", host="http://localhost:11434", pool=None):
         self.model = model
         self.url = f"{host}/api/generate"
+        # ModelBackendPool: если задан, запросы распределяются между бэкендами
+        self.pool = pool
 
-    def __call__(self, prompt, max_length=200, do_sample=False):
-        response = requests.post(self.url, json={
+    def __call__(self, prompt, max_length=200, do_sample=False, timeout=None):
+        payload = {
             "model": self.model,
             "prompt": prompt,
             "stream": False
-        })
-        response.raise_for_status()
+        }
+        if self.pool is not None:
+            response = self.pool.post("/api/generate", model=self.model, json=payload,
+                                      timeout=timeout)
+        else:
+            response = requests.post(self.url, json=payload, timeout=timeout)
+            response.raise_for_status()
         return [{"generated_text": response.json()["response"]}]
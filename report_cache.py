@@ -0,0 +1,145 @@
+"""
+report_cache.py: локальный сжатый кэш сырых отчётов Allure (suites JSON).
+
+Отчёт хранится как <key>.json.gz, валидаторы ответа (ETag, Last-Modified) —
+в <key>.meta.json. Повторная загрузка того же UUID отправляет условный
+GET (If-None-Match / If-Modified-Since) и при 304 берёт отчёт из кэша.
+Режим offline вообще не обращается к сети. Старые записи вытесняются,
+когда суммарный размер кэша превышает max_bytes.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+DEFAULT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "/data/report_cache")
+DEFAULT_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+class ReportCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key_for(value: str) -> str:
+        """UUID используется как есть, произвольный URL — через sha1."""
+        if re.fullmatch(r"[A-Za-z0-9_-]{1,128}", value):
+            return value
+        return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        return self.root / f"{key}.json.gz", self.root / f"{key}.meta.json"
+
+    # ---------- чтение / запись ----------
+
+    def get(self, key: str) -> Optional[dict]:
+        data_path, _ = self._paths(key)
+        try:
+            with gzip.open(data_path, "rt", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, EOFError, ValueError):
+            # повреждённая или обрезанная запись — считаем промахом кэша
+            return None
+        # обновляем mtime: вытеснение идёт по давности использования
+        try:
+            os.utime(data_path)
+        except FileNotFoundError:
+            # запись только что вытеснил параллельный процесс — отчёт уже прочитан
+            pass
+        return report
+
+    def meta(self, key: str) -> dict:
+        _, meta_path = self._paths(key)
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_atomic(self, path: Path, data: bytes):
+        """Уникальный временный файл + os.replace: параллельные записи
+        одного ключа (тот же UUID дважды) не смешиваются."""
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def put(self, key: str, report: dict, etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        self.root.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        payload = json.dumps(report, ensure_ascii=False).encode("utf-8")
+        self._write_atomic(data_path, gzip.compress(payload))
+        meta = {k: v for k, v in (("etag", etag), ("last_modified", last_modified)) if v}
+        self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in self.root.glob("*.json.gz"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                # запись уже удалил параллельный процесс
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort(key=lambda e: e[0], reverse=True)
+        total = 0
+        # самый свежий отчёт оставляем всегда, даже если он больше лимита
+        for i, (_, size, path) in enumerate(entries):
+            total += size
+            if total > self.max_bytes and i > 0:
+                key = path.name[:-len(".json.gz")]
+                for p in self._paths(key):
+                    p.unlink(missing_ok=True)
+                print(f"🗑️ Отчёт {key} вытеснен из кэша")
+
+    # ---------- загрузка ----------
+
+    def fetch(self, url: str, auth, key: Optional[str] = None, offline: bool = False) -> dict:
+        """
+        Отчёт по url с учётом кэша. offline=True — только из кэша
+        (CacheMiss, если его там нет).
+        """
+        key = self.key_for(key or url)
+        cached = self.get(key)
+        if offline:
+            if cached is None:
+                raise CacheMiss(f"Отчёт {key} отсутствует в кэше {self.root}")
+            print(f"📦 Отчёт {key} взят из кэша (offline)")
+            return cached
+
+        headers = {"Accept": "application/json"}
+        if cached is not None:
+            meta = self.meta(key)
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = requests.get(url, auth=auth, headers=headers)
+        if resp.status_code == 304 and cached is not None:
+            print(f"📦 Отчёт {key} не изменился, взят из кэша")
+            return cached
+        resp.raise_for_status()
+        report = resp.json()
+        try:
+            self.put(key, report, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить отчёт {key} в кэш: {e}")
+        return report
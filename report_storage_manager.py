@@ -2,7 +2,7 @@ import os
 import json
 from pathlib import Path
 
-BASE_DIR = Path("/data/vector_store")
+BASE_DIR = Path(os.getenv("VECTOR_STORE_DIR", "/data/vector_store"))
 MAX_REPORTS = 3
 
 def sanitize_folder_name(name: str) -> str:
@@ -0,0 +1,127 @@
+"""
+retrieval.py: поиск информативных чанков по нескольким запросам-намерениям.
+
+Все запросы кодируются одним батчем, релевантность считается одним
+матричным произведением нормированных векторов, top-k выбирается через
+argpartition, а MMR (maximal marginal relevance) убирает дубликаты.
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Запросы-намерения: что именно мы ищем в отчёте. Пишем по-английски:
+# энкодеры (paraphrase-/all-MiniLM-L6-v2) англоязычные, как и имена тестов Allure
+INTENT_QUERIES = [
+    "failed tests: errors, exceptions, assertion error, status failed",
+    "broken tests: infrastructure or environment problems, timeout, connection refused",
+    "flaky unstable tests that sometimes pass and sometimes fail",
+    "regressions: tests that used to pass and now fail",
+]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-нормировка строк; нулевые векторы остаются нулевыми."""
+    vectors = np.asarray(vectors, dtype="float32")
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Индексы k наибольших значений по убыванию без полной сортировки."""
+    n = scores.shape[0]
+    if k >= n:
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def mmr(embeddings: np.ndarray, relevance: np.ndarray, k: int,
+        lambda_: float = 0.7) -> List[int]:
+    """
+    Жадный выбор k элементов по MMR:
+      lambda * релевантность - (1 - lambda) * max сходство с уже выбранными.
+    embeddings должны быть нормированы; возвращает позиции в embeddings.
+    """
+    n = embeddings.shape[0]
+    k = min(k, n)
+    if k == 0:
+        return []
+    selected = [int(np.argmax(relevance))]
+    max_sim = embeddings @ embeddings[selected[0]]
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < k:
+        score = lambda_ * relevance - (1 - lambda_) * max_sim
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim, embeddings @ embeddings[best], out=max_sim)
+    return selected
+
+
+class RetrievalEngine:
+    """Общий поиск чанков для daily_report.py и analyzer.py."""
+
+    def __init__(self, model,
+                 queries: Sequence[str] = INTENT_QUERIES,
+                 mmr_lambda: float = 0.7,
+                 candidate_factor: int = 4):
+        self.model = model
+        self.queries = list(queries)
+        self.mmr_lambda = mmr_lambda
+        self.candidate_factor = candidate_factor
+        self._intent_embs = None
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        embs = self.model.encode(list(texts), convert_to_numpy=True, show_progress_bar=False)
+        return normalize(embs)
+
+    def intent_embeddings(self) -> np.ndarray:
+        """Запросы-намерения не меняются — кодируем их один раз на движок."""
+        if self._intent_embs is None:
+            self._intent_embs = self.encode(self.queries)
+        return self._intent_embs
+
+    def index(self, chunks: Sequence[str]) -> np.ndarray:
+        """Нормированные эмбеддинги чанков — это и есть индекс."""
+        return self.encode(chunks)
+
+    def search(self, embeddings: np.ndarray,
+               queries: Sequence[str] = (),
+               top_k: int = 10,
+               prior: Optional[np.ndarray] = None,
+               prior_weight: float = 0.0) -> List[int]:
+        """
+        Индексы top_k чанков. Релевантность — максимум косинусного сходства
+        по всем запросам (намерения + дополнительные queries). Неотрицательный
+        prior (например, оценка аномальности) нормируется к [0, 1] и
+        добавляется с весом prior_weight.
+        """
+        if embeddings.shape[0] == 0 or top_k <= 0:
+            return []
+        docs = normalize(embeddings)
+        parts = []
+        if self.queries:
+            parts.append(self.intent_embeddings())
+        if queries:
+            parts.append(self.encode(queries))
+        if parts:
+            relevance = (docs @ np.vstack(parts).T).max(axis=1)
+        else:
+            relevance = np.zeros(docs.shape[0], dtype="float32")
+        if prior is not None and prior_weight:
+            prior = np.asarray(prior, dtype="float32")
+            top = prior.max() if prior.size else 0.0
+            if top > 0:
+                relevance = relevance + prior_weight * prior / top
+
+        candidates = top_k_indices(relevance, top_k * self.candidate_factor)
+        picked = mmr(docs[candidates], relevance[candidates], top_k, self.mmr_lambda)
+        return [int(candidates[i]) for i in picked]
+
+    def retrieve(self, chunks: Sequence[str], embeddings: np.ndarray, **kwargs) -> List[str]:
+        return [chunks[i] for i in self.search(embeddings, **kwargs) if i < len(chunks)]
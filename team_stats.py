@@ -0,0 +1,188 @@
+"""
+team_stats.py: накопительная статистика эмбеддингов команды и оценка аномальности.
+
+Для каждой команды хранится stats.npz рядом с emb_*.npz:
+  count, mean, m2  — число векторов, среднее и сумма квадратов отклонений
+                     (объединение батчей по формулам Чана/Уэлфорда);
+  sketch           — опционально: low-rank скетч ковариации (Frequent Directions).
+
+Обновление и оценка стоят O(новых чанков); историю перечитывать не нужно.
+Чтение-обновление-запись stats.npz выполняется под блокировкой команды:
+threading.Lock внутри процесса и flock на stats.lock между процессами.
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: остаётся только блокировка внутри процесса
+    fcntl = None
+
+STATS_FILE = "stats.npz"
+LOCK_FILE = "stats.lock"
+EPS = 1e-6
+
+_locks: dict = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def team_lock(team_folder: Path):
+    """Эксклюзивный доступ к статистике команды (потоки и процессы)."""
+    team_folder = Path(team_folder)
+    team_folder.mkdir(parents=True, exist_ok=True)
+    key = str(team_folder.resolve())
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(team_folder / LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TeamStats:
+    def __init__(self, dim: int, rank: int = 0):
+        self.dim = dim
+        self.rank = rank
+        self.count = 0
+        self.mean = np.zeros(dim, dtype="float64")
+        self.m2 = np.zeros(dim, dtype="float64")
+        self.sketch = np.zeros((2 * rank, dim), dtype="float64") if rank else None
+
+    # ---------- хранение ----------
+
+    @classmethod
+    def load(cls, team_folder: Path, dim: int, rank: int = 0) -> "TeamStats":
+        """
+        Загружает stats.npz. Если файла нет, но есть старые emb_*.npz,
+        статистика один раз строится по ним. Так же пересчитывается файл,
+        записанный для другой размерности (сменилась модель эмбеддингов)
+        или другого STATS_RANK.
+        """
+        path = Path(team_folder) / STATS_FILE
+        if path.exists():
+            data = np.load(path)
+            stored_dim, stored_rank = int(data["mean"].shape[0]), int(data["rank"])
+            if (stored_dim, stored_rank) == (dim, rank):
+                stats = cls(dim, rank)
+                stats.count = int(data["count"])
+                stats.mean = data["mean"]
+                stats.m2 = data["m2"]
+                if stats.rank:
+                    stats.sketch = data["sketch"]
+                return stats
+            print(f"⚠️ {path}: статистика для dim={stored_dim}, rank={stored_rank}, "
+                  f"нужна dim={dim}, rank={rank} — пересчитываю по emb_*.npz")
+
+        stats = cls(dim, rank)
+        for f in sorted(Path(team_folder).glob("emb_*.npz"), key=os.path.getctime):
+            embedding = np.load(f, allow_pickle=True)["embedding"]
+            if embedding.ndim == 2 and embedding.shape[1] == dim:
+                stats.update(embedding)
+        return stats
+
+    def save(self, team_folder: Path):
+        team_folder = Path(team_folder)
+        team_folder.mkdir(parents=True, exist_ok=True)
+        arrays = dict(count=self.count, rank=self.rank, mean=self.mean, m2=self.m2)
+        if self.rank:
+            arrays["sketch"] = self.sketch
+        fd, tmp = tempfile.mkstemp(dir=team_folder, prefix="stats.", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            # атомарная замена: анализ не увидит наполовину записанный файл
+            os.replace(tmp, team_folder / STATS_FILE)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    # ---------- обновление ----------
+
+    def update(self, embeddings: np.ndarray):
+        x = np.asarray(embeddings, dtype="float64")
+        n = x.shape[0]
+        if n == 0:
+            return
+        batch_mean = x.mean(axis=0)
+        batch_m2 = ((x - batch_mean) ** 2).sum(axis=0)
+
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        if self.rank:
+            self._update_sketch(x - self.mean)
+
+    def _update_sketch(self, centered: np.ndarray):
+        """Frequent Directions: B^T B приближает матрицу рассеяния."""
+        stacked = np.vstack([self.sketch, centered])
+        _, s, vt = np.linalg.svd(stacked, full_matrices=False)
+        size = self.sketch.shape[0]
+        shrink = s[self.rank] ** 2 if s.shape[0] > self.rank else 0.0
+        s = np.sqrt(np.maximum(s[:size] ** 2 - shrink, 0.0))
+        sketch = np.zeros_like(self.sketch)
+        sketch[:s.shape[0]] = s[:, None] * vt[:size]
+        self.sketch = sketch
+
+    # ---------- оценка ----------
+
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.ones(self.dim)
+        return self.m2 / (self.count - 1)
+
+    def score(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Насколько каждый вектор отличается от обычного поведения команды:
+        RMS z-оценка по измерениям (или расстояние Махаланобиса в модели
+        "low-rank + изотропный остаток", если включён скетч). Около 1 — норма.
+        Без накопленной истории возвращает нули.
+        """
+        x = np.asarray(embeddings, dtype="float64")
+        if self.count < 2 or x.shape[0] == 0:
+            return np.zeros(x.shape[0], dtype="float32")
+        centered = x - self.mean
+        var = self.variance()
+
+        if not self.rank:
+            z2 = centered ** 2 / (var + EPS)
+            return np.sqrt(z2.mean(axis=1)).astype("float32")
+
+        norms = np.linalg.norm(self.sketch, axis=1)
+        keep = norms[:self.rank] > EPS
+        components = self.sketch[:self.rank][keep] / norms[:self.rank][keep, None]
+        eigvals = norms[:self.rank][keep] ** 2 / (self.count - 1)
+
+        proj = centered @ components.T
+        residual = centered - proj @ components
+        free_dims = max(self.dim - components.shape[0], 1)
+        residual_var = max((var.sum() - eigvals.sum()) / free_dims, EPS)
+
+        d2 = (proj ** 2 / (eigvals + EPS)).sum(axis=1) + (residual ** 2).sum(axis=1) / residual_var
+        return np.sqrt(d2 / self.dim).astype("float32")
+
+
+def score_and_update(team_folder: Path, embeddings: np.ndarray,
+                     rank: int = 0) -> np.ndarray:
+    """Оценивает новые чанки по прошлой статистике, затем добавляет их в неё."""
+    with team_lock(team_folder):
+        stats = TeamStats.load(team_folder, embeddings.shape[1], rank)
+        scores = stats.score(embeddings)
+        stats.update(embeddings)
+        stats.save(team_folder)
+    return scores
@@ -2,7 +2,12 @@ import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
 import pytest
+from model_pool import ModelBackendPool, Backend
 from daily_report import load_report_from_api, flatten_report, ask_model_nonstream, ask_model_stream
 
 
@@ -67,7 +72,7 @@ def test_ask_model_nonstream_includes_full_context(monkeypatch, tmp_path):
     context = json.dumps(data, ensure_ascii=False)
 
     captured = {}
-    def fake_post(url, json):
+    def fake_post(url, json, timeout=None):
         captured["url"] = url
         captured["json"] = json
         return DummyResponse({"choices": [{"text": "OK"}]})
@@ -105,7 +110,7 @@ def test_ask_model_stream_success(monkeypatch):
         def raise_for_status(self): pass
         def iter_lines(self, decode_unicode=True): return self._lines
 
-    def fake_post(url, json, stream):
+    def fake_post(url, json, stream, timeout=None):
         assert stream is True
         return DummyStream(lines)
     monkeypatch.setattr("daily_report.requests.post", fake_post)
@@ -128,11 +133,11 @@ def test_ask_model_stream_fallback(monkeypatch):
         def raise_for_status(self): pass
         def iter_lines(self, decode_unicode=True): return []
 
-    def fake_post_empty(url, json, stream): return DummyStreamEmpty()
+    def fake_post_empty(url, json, stream, timeout=None): return DummyStreamEmpty()
     monkeypatch.setattr("daily_report.requests.post", fake_post_empty)
 
     called = {}
-    def fake_nonstream(prompt, context, model_name, host, port, max_tokens):
+    def fake_nonstream(prompt, context, model_name, host, port, max_tokens, timeout=None):
         called['args'] = (prompt, context, model_name, host, port, max_tokens)
         return 'FALLBACK'
     monkeypatch.setattr("daily_report.ask_model_nonstream", fake_nonstream)
@@ -147,3 +152,41 @@ def test_ask_model_stream_fallback(monkeypatch):
     )
     assert result == 'FALLBACK'
     assert called['args'][0] == 'P2'
+
+
+# 6) Стрим, зависший на середине: TimeoutError к deadline, бэкенд не исключается
+def test_ask_model_stream_stall_hits_deadline():
+    class StallingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            line = b'data: {"choices":[{"delta":{"content":"Hel"}}]}\n\n'
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            time.sleep(5)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StallingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        backend = Backend(f"127.0.0.1:{server.server_port}")
+        pool = ModelBackendPool([backend])
+
+        def ask(b):
+            return ask_model_stream("P", "CTX", "m", b.host, b.port, 10, timeout=1.0)
+
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            pool.call(ask)
+        assert time.monotonic() - started < 2.0
+        assert backend.healthy and backend.failures == 0
+    finally:
+        server.shutdown()
+        server.server_close()
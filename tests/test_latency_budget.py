@@ -0,0 +1,86 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+from collections import Counter
+
+import pytest
+from latency_budget import LatencyBudget, Tier, build_tiers, run_tiers, stats_summary
+
+
+# 1) Неограниченный бюджет и учёт стадий
+def test_budget_stages_and_unlimited():
+    budget = LatencyBudget()
+    assert budget.remaining() == float("inf")
+    assert budget.timeout() is None
+    with budget.stage("fetch"):
+        time.sleep(0.01)
+    assert budget.stages["fetch"] >= 0.01
+
+
+# 2) Лестница уровней без дубликатов модели
+def test_build_tiers():
+    tiers = build_tiers("gemma3:4b", "gemma3:1b", top_k=20)
+    assert [(t.name, t.model, t.top_k) for t in tiers] == [
+        ("full", "gemma3:4b", 20),
+        ("small", "gemma3:1b", 20),
+        ("reduced", "gemma3:1b", 5),
+    ]
+    assert [t.name for t in build_tiers("gemma3:1b", "gemma3:1b", top_k=20)] == ["full", "reduced"]
+
+
+# 3) При малом остатке бюджета дорогие уровни пропускаются
+def test_run_tiers_skips_expensive_tiers():
+    budget = LatencyBudget(15)
+    called = []
+
+    def generate(tier, timeout):
+        called.append(tier.name)
+        assert 0 < timeout <= 15
+        return f"answer from {tier.model}"
+
+    text, tier = run_tiers(budget, build_tiers("gemma3:4b", "gemma3:1b", 20), generate, lambda: "STATS")
+    assert tier == "small"
+    assert called == ["small"]
+    assert text == "answer from gemma3:1b"
+
+
+# 4) Сбой уровня -> следующий; исчерпанный бюджет -> статистика
+def test_run_tiers_degrades_to_stats():
+    tiers = build_tiers("gemma3:4b", "gemma3:1b", 20)
+
+    def failing(tier, timeout):
+        raise TimeoutError("slow")
+
+    assert run_tiers(LatencyBudget(), tiers, failing, lambda: "STATS") == ("STATS", "stats")
+
+    def never_called(tier, timeout):
+        pytest.fail("бюджет исчерпан, модель вызываться не должна")
+
+    assert run_tiers(LatencyBudget(0), tiers, never_called, lambda: "STATS") == ("STATS", "stats")
+
+
+# 5) Статистическая сводка из Counter статусов
+def test_stats_summary():
+    text = stats_summary(Counter({"passed": 6, "failed": 3, "broken": 1}))
+    assert "Всего тестов: 10" in text
+    assert "- failed: 3 (30.0%)" in text
+    assert "Требуют внимания: 4" in text
+
+
+# 6) Зависший основной уровень оставляет время на лёгкую модель
+def test_run_tiers_reserves_time_for_cheaper_tier():
+    tiers = [Tier("full", "gemma3:4b", 20, 0.3), Tier("small", "gemma3:1b", 20, 0.2)]
+    timeouts = {}
+
+    def generate(tier, timeout):
+        timeouts[tier.name] = timeout
+        if tier.name == "full":
+            time.sleep(timeout)
+            raise TimeoutError("slow main model")
+        return "answer from gemma3:1b"
+
+    text, tier = run_tiers(LatencyBudget(1.0), tiers, generate, lambda: "STATS")
+    assert (text, tier) == ("answer from gemma3:1b", "small")
+    assert timeouts["full"] <= 0.8
+    assert timeouts["small"] >= 0.15
@@ -0,0 +1,186 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+import load_test
+from load_test import (StubAllure, StubOllama, StubServer, _StubHandler, synthetic_report,
+                       run_load, percentile, check_gates, process_tree_rss_mb,
+                       spawn_service, make_sender, main)
+from daily_report import flatten_report, ask_model_stream, ask_model_nonstream
+from ollama_client import OllamaLLM
+
+
+@pytest.fixture
+def allure():
+    stub = StubAllure(n_tests=50).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def ollama():
+    stub = StubOllama(latency=0.0, tokens_per_second=1000, response_tokens=5).start()
+    yield stub
+    stub.stop()
+
+
+# 1) Синтетический отчёт разбирается как настоящий
+def test_synthetic_report():
+    report = synthetic_report("Команда", n_tests=45, failure_rate=0.5, seed=1)
+    items = flatten_report(report)
+    assert len(items) == 45
+    assert report["children"][0]["name"] == "Команда"
+    assert {it["status"] for it in items} - {"passed"}
+
+
+# 2) Stub Allure отдаёт отчёт и фиксирует отправленный анализ
+def test_stub_allure(allure):
+    report = requests.get(f"{allure.get_url_base}/abc/suites/json").json()
+    assert len(flatten_report(report)) == 50
+    requests.post(f"{allure.post_url_base}/abc", json=[{"rule": "d", "message": "m"}])
+    assert allure.wait_analysis("abc", timeout=1)
+    assert allure.analyses["abc"][0]["message"] == "m"
+
+
+# 3) Stub Ollama совместим с клиентами сервиса (stream и non-stream)
+def test_stub_ollama_clients(ollama):
+    host, port = ollama.url.split("://")[1].split(":")
+    expected = "tok0 tok1 tok2 tok3 tok4 "
+    assert ask_model_stream("P", "CTX", "gemma3:1b", host, int(port), 10) == expected
+    assert ask_model_nonstream("P", "CTX", "gemma3:1b", host, int(port), 10) == expected.strip()
+    assert OllamaLLM("gemma3:1b", host=ollama.url)("hi")[0]["generated_text"] == expected
+    assert requests.get(f"{ollama.url}/api/tags").json()["models"][0]["name"] == "gemma3:1b"
+    assert ollama.requests == 3
+
+    # счётчик запросов не теряет инкременты под параллельной нагрузкой
+    before = ollama.requests
+    run_load(lambda i: requests.post(f"{ollama.url}/api/generate", json={"stream": False}).ok,
+             concurrency=8, total=40)
+    assert ollama.requests == before + 40
+
+
+# 4) Замкнутый и открытый цикл нагрузки, статистика латентности
+def test_run_load(allure):
+    def send(i):
+        if i % 10 == 9:
+            raise ValueError("boom")
+        return requests.get(f"{allure.get_url_base}/u{i}/suites/json").ok
+
+    closed = run_load(send, concurrency=4, total=20)
+    assert closed["requests"] == 20
+    assert closed["ok"] == 18
+    assert closed["errors"] == {"ValueError": 2}
+    assert closed["error_rate"] == pytest.approx(0.1)
+    assert closed["latency_s"]["p50"] <= closed["latency_s"]["p99"]
+
+    started = time.perf_counter()
+    opened = run_load(lambda i: True, concurrency=2, rate=50, duration=0.3)
+    assert 0.3 <= time.perf_counter() - started < 2
+    assert opened["ok"] > 0
+
+
+# 5) Перцентили, пороги релиза и память процесса
+def test_percentile_gates_memory():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+    result = {"latency_s": {"p95": 2.0}, "error_rate": 0.05, "throughput_rps": 1.0}
+    assert check_gates(result, max_p95=3, max_error_rate=0.1) == []
+    assert len(check_gates(result, max_p95=1, max_error_rate=0.01, min_throughput=2)) == 3
+
+    if os.path.exists("/proc/self/status"):
+        assert process_tree_rss_mb(os.getpid()) > 0
+
+
+class _FakeServiceHandler(_StubHandler):
+    """Сервис под нагрузкой: /analyze отвечает сразу, /uuid отправляет анализ в Allure."""
+
+    def do_POST(self):
+        body = self._body()
+        if self.path == "/analyze":
+            self._send_json({"team": "t", "summary": "ok", "tier": "stats"})
+            return
+        requests.post(f"{self.server.stub.post_url_base}/{body['uuid']}",
+                      json=[{"rule": "d", "message": "m"}])
+        self._send_json({"status": "accepted"})
+
+
+class FakeService(StubServer):
+    handler = _FakeServiceHandler
+
+    def __init__(self, post_url_base, **kwargs):
+        super().__init__(**kwargs)
+        self.post_url_base = post_url_base
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# 6) Запускаемый сервис настроен на заглушки и не ходит в сеть за моделями
+def test_spawn_service_env(monkeypatch, allure, ollama, tmp_path):
+    calls = []
+    monkeypatch.setattr(load_test.subprocess, "Popen",
+                        lambda cmd, **kwargs: calls.append((cmd, kwargs)))
+    monkeypatch.delenv("HF_HUB_OFFLINE", raising=False)
+    spawn_service("uuid", 18555, allure, ollama, tmp_path)
+    spawn_service("analyze", 18556, allure, ollama, tmp_path)
+
+    (uuid_cmd, kwargs), (analyze_cmd, _) = calls
+    env = kwargs["env"]
+    assert uuid_cmd[-1] == "uuid_service.py"
+    assert "main_api:app" in analyze_cmd and "18556" in analyze_cmd
+    assert env["MODEL_HOSTS"] == ollama.url
+    assert env["GET_URL_BASE"] == allure.get_url_base
+    assert env["POST_URL_BASE"] == allure.post_url_base
+    assert env["UUID_SERVICE_PORT"] == "18555"
+    assert env["VECTOR_STORE_DIR"].startswith(str(tmp_path))
+    assert env["HF_HUB_OFFLINE"] == "1" and env["TRANSFORMERS_OFFLINE"] == "1"
+
+
+# 7) Отправители /analyze и /uuid (с ожиданием анализа и без)
+def test_make_sender(allure):
+    service = FakeService(allure.post_url_base).start()
+    try:
+        args = SimpleNamespace(timeout=5, budget=20, no_wait=False)
+        assert make_sender("analyze", service.url, allure, args)(0)
+        assert make_sender("uuid", service.url, allure, args)(0)
+        assert len(allure.analyses) == 1
+
+        args.no_wait = True
+        assert make_sender("uuid", service.url, allure, args)(1)
+        assert len(allure.analyses) == 2
+    finally:
+        service.stop()
+
+
+# 8) main против уже запущенного сервиса: заглушки на заданных портах, отчёт в JSON
+def test_main_with_target(tmp_path):
+    allure_port = free_port()
+    service = FakeService(f"http://127.0.0.1:{allure_port}/api/analysis/report").start()
+    out = tmp_path / "result.json"
+    try:
+        with pytest.raises(SystemExit) as exit_info:
+            main(["uuid", "--target", service.url, "--allure-port", str(allure_port),
+                  "--requests", "4", "--concurrency", "2", "--timeout", "5",
+                  "--max-error-rate", "0", "--json", str(out)])
+        assert exit_info.value.code == 0
+        result = json.loads(out.read_text())
+        assert result["ok"] == 4
+
+        # без фиксированного порта Allure анализ до заглушки не дойдёт
+        with pytest.raises(SystemExit) as exit_info:
+            main(["uuid", "--target", service.url])
+        assert exit_info.value.code == 2
+    finally:
+        service.stop()
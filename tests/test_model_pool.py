@@ -0,0 +1,207 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+from model_pool import ModelBackendPool, Backend, parse_endpoints
+
+
+def start_stub_ollama(models=("gemma3:1b",), latency=0.0):
+    """Однопоточный stub Ollama: обрабатывает запросы строго последовательно."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._send({"models": [{"name": m} for m in models]})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            self.server.hits += 1
+            self._send({"response": f"ok from {self.server.server_port}"})
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def factory(*args, **kwargs):
+        s = start_stub_ollama(*args, **kwargs)
+        started.append(s)
+        return s
+
+    yield factory
+    for s in started:
+        s.shutdown()
+        s.server_close()
+
+
+def spec_for(*servers):
+    return ",".join(f"127.0.0.1:{s.server_port}" for s in servers)
+
+
+# 1) Разбор списка эндпоинтов
+def test_parse_endpoints():
+    backends = parse_endpoints("h1:1,http://h2:2=gemma3:4b|gemma3:1b, h3")
+    assert [b.url for b in backends] == ["http://h1:1", "http://h2:2", "http://h3"]
+    assert backends[1].models == {"gemma3:4b", "gemma3:1b"}
+    assert backends[2].port == 11434
+
+
+# 2) Выбор бэкенда с наименьшим числом незавершённых запросов
+def test_acquire_least_outstanding():
+    pool = ModelBackendPool([Backend("a:1"), Backend("b:2")])
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    pool.release(first)
+    assert pool.acquire() is first
+
+
+# 3) Маршрутизация по имени модели (модели берутся из /api/tags)
+def test_routing_by_model(servers):
+    small = servers(models=("gemma3:1b",))
+    large = servers(models=("gemma3:4b",))
+    pool = ModelBackendPool.from_spec(spec_for(small, large))
+    assert pool.probe_all() == 2
+
+    for _ in range(4):
+        pool.post("/api/generate", model="gemma3:4b", json={})
+    assert large.hits == 4
+    assert small.hits == 0
+
+
+# 4) Сбойный бэкенд исключается и возвращается после успешной проверки
+def test_eject_and_readmit(servers):
+    alive = servers()
+    dead = Backend("127.0.0.1:1")
+    pool = ModelBackendPool([dead, Backend(f"127.0.0.1:{alive.server_port}")],
+                            max_failures=1, eject_seconds=60)
+
+    for _ in range(3):
+        resp = pool.post("/api/generate", json={})
+        assert resp.json()["response"].startswith("ok")
+    assert not dead.healthy
+    assert alive.hits == 3
+
+    # "поднимаем" бэкенд на новом адресе и проверяем возврат в пул
+    revived = servers()
+    dead.url = f"http://127.0.0.1:{revived.server_port}"
+    assert pool.probe(dead)
+    assert dead.healthy
+
+
+# 5) Пропускная способность растёт почти линейно с числом бэкендов
+def test_throughput_scales_with_backends(servers):
+    latency, requests_total = 0.05, 24
+
+    def run(n_backends):
+        stubs = [servers(latency=latency) for _ in range(n_backends)]
+        pool = ModelBackendPool.from_spec(spec_for(*stubs))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            list(ex.map(lambda _: pool.post("/api/generate", json={}), range(requests_total)))
+        elapsed = time.perf_counter() - started
+        assert sum(s.hits for s in stubs) == requests_total
+        return requests_total / elapsed
+
+    one = run(1)
+    four = run(4)
+    # идеально — 4x; допускаем накладные расходы потоков и HTTP
+    assert four / one > 2.5
+
+
+# 6) Бэкенд, не прошедший проверку, сразу исключается; запрос уходит на живой
+def test_failed_probe_ejects_and_call_fails_over(servers):
+    alive = servers()
+    dead = Backend("127.0.0.1:1")
+    pool = ModelBackendPool([dead, Backend(f"127.0.0.1:{alive.server_port}")])
+    assert pool.probe_all() == 1
+    assert not dead.healthy
+    for _ in range(4):
+        assert pool.acquire() is not dead
+
+    # без проверки: первый бэкенд мёртв, call переходит на следующий
+    dead = Backend("127.0.0.1:1")
+    pool = ModelBackendPool([dead, Backend(f"127.0.0.1:{alive.server_port}")], max_failures=1)
+    pool._rr = 0
+    hits = alive.hits
+    assert pool.call(pool_post).startswith("ok")
+    assert alive.hits == hits + 1
+
+
+def pool_post(backend):
+    resp = requests.post(f"{backend.url}/api/generate", json={})
+    resp.raise_for_status()
+    return resp.json()["response"]
+
+
+# 7) После истечения исключения — один пробный запрос; неудача исключает снова
+def test_ejected_backend_gets_single_trial(servers):
+    revived = servers()
+    flaky = Backend("127.0.0.1:1")
+    other = Backend("127.0.0.1:2")
+    pool = ModelBackendPool([flaky, other], max_failures=1, eject_seconds=60)
+    pool._mark_failure(flaky)
+    assert not flaky.healthy
+
+    # пока исключение действует, бэкенд не выбирается даже при меньшей загрузке
+    held = pool.acquire()
+    assert held is other
+    assert pool.acquire() is other
+
+    # исключение истекло: ровно один пробный запрос, остальные — на other
+    flaky.ejected_until = 0
+    assert pool.acquire() is flaky and flaky.trial
+    assert pool.acquire() is other
+    pool.release(flaky, ok=False)
+    assert not flaky.healthy and flaky.ejected_until > time.monotonic()
+    assert pool.acquire() is other
+
+    # успешный пробный запрос возвращает бэкенд в пул
+    flaky.ejected_until = 0
+    flaky.url = f"http://127.0.0.1:{revived.server_port}"
+    assert pool.call(pool_post, retries=0).startswith("ok")
+    assert flaky.healthy
+
+
+# 8) Одноразовые пулы не начинают всегда с первого бэкенда
+def test_tie_break_start_is_randomized():
+    firsts = {ModelBackendPool([Backend("a:1"), Backend("b:2"), Backend("c:3")]).acquire().url
+              for _ in range(50)}
+    assert len(firsts) > 1
+
+
+# 9) Failover не возвращается к уже упавшему бэкенду, даже если остальные заняты
+def test_call_fails_over_past_dead_backend_when_others_busy(servers):
+    a, b = servers(), servers()
+    dead = Backend("127.0.0.1:1")
+    pool = ModelBackendPool([dead, Backend(f"127.0.0.1:{a.server_port}"),
+                             Backend(f"127.0.0.1:{b.server_port}")])
+    busy = [pool.acquire(), pool.acquire(), pool.acquire()]
+    pool.release(busy.pop(busy.index(dead)), ok=True)
+    # у мёртвого outstanding = 0, у живых по 1: без исключения call выбирал бы его снова
+    hits = a.hits + b.hits
+    assert pool.call(pool_post).startswith("ok")
+    assert a.hits + b.hits == hits + 1
+    assert dead.failures == 1 and dead.healthy
@@ -0,0 +1,108 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+from report_cache import ReportCache, CacheMiss
+from daily_report import load_report_from_api
+
+
+class DummyResponse:
+    def __init__(self, payload=None, status=200, headers=None):
+        self._payload = payload
+        self.status_code = status
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._payload
+
+
+URL = "http://example/api/report/UUID-1/suites/json"
+REPORT = {"name": "suites", "children": [{"name": "Команда", "status": "failed"}]}
+
+
+# 1) Первая загрузка сохраняет отчёт, повторная ревалидируется по ETag (304)
+def test_conditional_fetch(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_get(url, auth, headers):
+        calls.append(dict(headers))
+        if headers.get("If-None-Match") == '"v1"':
+            return DummyResponse(status=304)
+        return DummyResponse(REPORT, headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    monkeypatch.setattr("report_cache.requests.get", fake_get)
+    cache = ReportCache(tmp_path)
+
+    assert load_report_from_api(URL, ("u", "p"), cache, "UUID-1") == REPORT
+    assert load_report_from_api(URL, ("u", "p"), cache, "UUID-1") == REPORT
+    assert "If-None-Match" not in calls[0]
+    assert calls[1]["If-None-Match"] == '"v1"'
+    assert calls[1]["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert (tmp_path / "UUID-1.json.gz").exists()
+
+
+# 2) Offline-режим не обращается к сети
+def test_offline_replay(monkeypatch, tmp_path):
+    def no_network(*args, **kwargs):
+        pytest.fail("offline-режим не должен обращаться к сети")
+
+    monkeypatch.setattr("report_cache.requests.get", no_network)
+    cache = ReportCache(tmp_path)
+    with pytest.raises(CacheMiss):
+        cache.fetch(URL, None, key="UUID-1", offline=True)
+
+    cache.put("UUID-1", REPORT)
+    assert cache.fetch(URL, None, key="UUID-1", offline=True) == REPORT
+
+
+# 3) Вытеснение по размеру: остаются самые свежие отчёты
+def test_size_based_eviction(tmp_path):
+    cache = ReportCache(tmp_path, max_bytes=1)
+    cache.put("old", REPORT)
+    os.utime(tmp_path / "old.json.gz", (1, 1))
+    cache.put("new", REPORT)
+    assert cache.get("old") is None
+    assert cache.get("new") == REPORT
+    assert not (tmp_path / "old.meta.json").exists()
+
+
+# 4) Произвольный URL превращается в безопасный ключ
+def test_key_for_url():
+    assert ReportCache.key_for("UUID-1") == "UUID-1"
+    key = ReportCache.key_for("http://x/a?b=1")
+    assert len(key) == 40 and "/" not in key
+
+
+# 5) Обрезанный gzip — промах кэша; параллельная запись одного ключа не портит запись
+def test_corrupt_entry_and_concurrent_put(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    cache = ReportCache(tmp_path)
+    cache.put("UUID-1", REPORT)
+    data = (tmp_path / "UUID-1.json.gz").read_bytes()
+    (tmp_path / "UUID-1.json.gz").write_bytes(data[:len(data) // 2])
+    assert cache.get("UUID-1") is None
+
+    big = {"children": [{"name": f"t{i}", "status": "passed"} for i in range(2000)]}
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda _: cache.put("UUID-1", big, etag='"v2"'), range(32)))
+    assert cache.get("UUID-1") == big
+    assert cache.meta("UUID-1") == {"etag": '"v2"'}
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+# 6) Запись вытеснена параллельным процессом сразу после чтения — отчёт всё равно отдаётся
+def test_entry_evicted_during_get(monkeypatch, tmp_path):
+    cache = ReportCache(tmp_path)
+    cache.put("UUID-1", REPORT)
+    real_utime = os.utime
+
+    def evict_then_utime(path, *args, **kwargs):
+        os.unlink(path)
+        return real_utime(path, *args, **kwargs)
+
+    monkeypatch.setattr("report_cache.os.utime", evict_then_utime)
+    assert cache.fetch(URL, auth=None, key="UUID-1", offline=True) == REPORT
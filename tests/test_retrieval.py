@@ -0,0 +1,65 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from retrieval import RetrievalEngine, normalize, top_k_indices, mmr
+
+
+class FakeEncoder:
+    """Детерминированный "энкодер": текст -> заранее заданный вектор."""
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.array([self.vectors[t] for t in texts], dtype="float32")
+
+
+# 1) top-k через argpartition совпадает с полной сортировкой
+def test_top_k_indices_matches_argsort():
+    rng = np.random.default_rng(0)
+    scores = rng.random(1000)
+    assert list(top_k_indices(scores, 7)) == list(np.argsort(-scores)[:7])
+    assert list(top_k_indices(scores[:3], 10)) == list(np.argsort(-scores[:3]))
+
+
+# 2) MMR не выбирает дубликаты
+def test_mmr_skips_duplicates():
+    embs = normalize(np.array([[1, 0], [1, 0], [0.9, 0.1], [0, 1]]))
+    relevance = np.array([0.9, 0.9, 0.85, 0.5], dtype="float32")
+    picked = mmr(embs, relevance, k=2, lambda_=0.5)
+    assert picked[0] == 0
+    assert picked[1] == 3
+
+
+# 3) Намерения кодируются одним батчем один раз, результат — разные намерения
+def test_engine_multi_query_batch():
+    vectors = {
+        "q_fail": [1, 0, 0], "q_infra": [0, 1, 0], "extra": [0, 0, 1],
+    }
+    engine = RetrievalEngine(FakeEncoder(vectors), queries=["q_fail", "q_infra"], mmr_lambda=0.5)
+    chunks = ["fail-1", "fail-1 copy", "infra", "noise"]
+    embs = np.array([[1, 0, 0.1], [1, 0, 0.1], [0.1, 1, 0], [0.3, 0.3, 0.3]], dtype="float32")
+
+    result = engine.retrieve(chunks, embs, queries=["extra"], top_k=2)
+    assert engine.model.calls == [["q_fail", "q_infra"], ["extra"]]
+    assert set(result) == {"fail-1", "infra"} or set(result) == {"fail-1 copy", "infra"}
+
+    # повторный поиск не перекодирует намерения
+    engine.retrieve(chunks, embs, top_k=2)
+    assert engine.model.calls == [["q_fail", "q_infra"], ["extra"]]
+
+
+# 4) Пустой индекс
+def test_engine_empty():
+    engine = RetrievalEngine(FakeEncoder({}), queries=[])
+    assert engine.search(np.zeros((0, 3), dtype="float32"), top_k=5) == []
+
+
+# 5) Оценка аномальности поднимает необычный чанк
+def test_engine_prior_boosts_anomalous_chunk():
+    engine = RetrievalEngine(FakeEncoder({"q": [1, 0]}), queries=["q"])
+    embs = np.array([[1, 0.1], [0.6, 0.8]], dtype="float32")
+    assert engine.search(embs, top_k=1) == [0]
+    assert engine.search(embs, top_k=1, prior=np.array([0.9, 4.0]), prior_weight=1.0) == [1]
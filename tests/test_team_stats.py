@@ -0,0 +1,98 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import pytest
+from team_stats import TeamStats, score_and_update, STATS_FILE
+
+
+def normal_batches(rng, n_batches=5, size=40, dim=8):
+    return [rng.normal(0, 1, (size, dim)) for _ in range(n_batches)]
+
+
+# 1) Инкрементальные среднее и дисперсия совпадают с расчётом по всей истории
+def test_incremental_matches_batch():
+    rng = np.random.default_rng(1)
+    batches = normal_batches(rng)
+    stats = TeamStats(dim=8)
+    for b in batches:
+        stats.update(b)
+    full = np.vstack(batches)
+    assert stats.count == full.shape[0]
+    np.testing.assert_allclose(stats.mean, full.mean(axis=0), atol=1e-10)
+    np.testing.assert_allclose(stats.variance(), full.var(axis=0, ddof=1), atol=1e-10)
+
+
+# 2) Необычные чанки получают более высокую оценку (диагональ и low-rank)
+@pytest.mark.parametrize("rank", [0, 3])
+def test_outliers_score_higher(rank):
+    rng = np.random.default_rng(2)
+    stats = TeamStats(dim=8, rank=rank)
+    for b in normal_batches(rng):
+        stats.update(b)
+    usual = rng.normal(0, 1, (20, 8))
+    unusual = rng.normal(0, 1, (20, 8)) + 6
+    assert stats.score(unusual).min() > stats.score(usual).max()
+    assert 0.5 < float(np.median(stats.score(usual))) < 1.5
+
+
+# 3) Без истории оценки нулевые; stats.npz сохраняется и читается обратно
+def test_score_and_update_roundtrip(tmp_path):
+    rng = np.random.default_rng(3)
+    first = rng.normal(0, 1, (30, 4)).astype("float32")
+    assert not score_and_update(tmp_path, first).any()
+    assert (tmp_path / STATS_FILE).exists()
+
+    second = rng.normal(0, 1, (30, 4)).astype("float32")
+    scores = score_and_update(tmp_path, second)
+    assert scores.shape == (30,)
+    assert scores.all()
+
+    stats = TeamStats.load(tmp_path, dim=4)
+    assert stats.count == 60
+    np.testing.assert_allclose(stats.mean, np.vstack([first, second]).mean(axis=0), atol=1e-6)
+
+
+# 4) При отсутствии stats.npz статистика строится по старым emb_*.npz
+def test_bootstrap_from_existing_embeddings(tmp_path):
+    rng = np.random.default_rng(4)
+    old = rng.normal(0, 1, (10, 4)).astype("float32")
+    np.savez_compressed(tmp_path / "emb_20250101_000000.npz", embedding=old, chunks=np.array(["x"] * 10))
+    stats = TeamStats.load(tmp_path, dim=4)
+    assert stats.count == 10
+
+
+# 5) Параллельные отчёты одной команды не теряют обновлений и не падают
+def test_concurrent_score_and_update(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    batch = np.random.default_rng(5).normal(0, 1, (200, 4)).astype("float32")
+
+    def worker(_):
+        for _ in range(30):
+            score_and_update(tmp_path, batch)
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(worker, range(8)))
+
+    assert TeamStats.load(tmp_path, dim=4).count == 8 * 30 * 200
+    assert not list(tmp_path.glob("stats.*.npz"))
+
+
+# 6) stats.npz другой размерности или ранга пересчитывается, а не роняет анализ
+def test_mismatched_stats_are_rebuilt(tmp_path):
+    rng = np.random.default_rng(6)
+    score_and_update(tmp_path, rng.normal(0, 1, (20, 8)))
+    # сменилась модель: история и новые отчёты уже в 16 измерениях
+    history = rng.normal(0, 1, (10, 16)).astype("float32")
+    np.savez_compressed(tmp_path / "emb_20250101_000000.npz", embedding=history,
+                        chunks=np.array(["x"] * 10))
+
+    scores = score_and_update(tmp_path, rng.normal(0, 1, (5, 16)))
+    assert scores.shape == (5,)
+    stats = TeamStats.load(tmp_path, dim=16)
+    assert stats.dim == 16 and stats.count == 15
+
+    # сменился STATS_RANK: скетч строится заново по истории
+    stats = TeamStats.load(tmp_path, dim=16, rank=2)
+    assert stats.rank == 2 and stats.count == 10
+    assert np.linalg.norm(stats.sketch) > 0
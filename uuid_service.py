@@ -13,17 +13,23 @@ ALLURE_USER = os.getenv('ALLURE_USER')
 ALLURE_PASS = os.getenv('ALLURE_PASS')
 MODEL_HOST = os.getenv('MODEL_HOST', 'localhost')
 MODEL_PORT = os.getenv('MODEL_PORT', '11434')
+# Optional list of Ollama backends, e.g. "host1:11434,host2:11434=gemma3:4b"
+MODEL_HOSTS = os.getenv('MODEL_HOSTS')
+DAILY_REPORT_SCRIPT = os.getenv('DAILY_REPORT_SCRIPT', '/app/daily_report.py')
+PORT = int(os.getenv('UUID_SERVICE_PORT', '5005'))
 
 
 def run_analysis(uuid):
     cmd = [
-        'python', '/app/daily_report.py',
+        'python', DAILY_REPORT_SCRIPT,
         '--uuid', uuid,
         '--user', ALLURE_USER,
         '--password', ALLURE_PASS,
         '--host', MODEL_HOST,
         '--port', MODEL_PORT
     ]
+    if MODEL_HOSTS:
+        cmd += ['--hosts', MODEL_HOSTS]
     env = os.environ.copy()
     env['GET_URL_BASE']  = GET_URL_BASE
     env['POST_URL_BASE'] = POST_URL_BASE
@@ -55,4 +61,4 @@ def set_uuid():
 
 if __name__ == '__main__':
     # start Flask server
-    app.run(host='0.0.0.0', port=5005)
+    app.run(host='0.0.0.0', port=PORT)
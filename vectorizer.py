@@ -1,14 +1,17 @@
 import os
 import json
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import time
+from team_stats import score_and_update
 
-BASE_DIR = Path("/data/vector_store")
+BASE_DIR = Path(os.getenv("VECTOR_STORE_DIR", "/data/vector_store"))
 MODEL_NAME = "models/all-MiniLM-L6-v2"
 MAX_EMBEDDINGS = 3
+# ранг low-rank скетча ковариации для оценки аномальности (0 — только диагональ)
+STATS_RANK = int(os.getenv("STATS_RANK", "0"))
 
 model = SentenceTransformer(MODEL_NAME)
 
@@ -29,13 +32,16 @@ def extract_text_chunks(report_json: dict) -> List[str]:
     recurse(report_json)
     return chunks
 
-def save_embedding(team_name: str, embedding: np.ndarray, chunks: List[str]):
+def save_embedding(team_name: str, embedding: np.ndarray, chunks: List[str],
+                   anomaly: Optional[np.ndarray] = None):
     team_folder = BASE_DIR / team_name
     team_folder.mkdir(parents=True, exist_ok=True)
 
     timestamp = time.strftime("%Y%m%d_%H%M%S")
     path = team_folder / f"emb_{timestamp}.npz"
-    np.savez_compressed(path, embedding=embedding, chunks=np.array(chunks))
+    if anomaly is None:
+        anomaly = np.zeros(len(chunks), dtype="float32")
+    np.savez_compressed(path, embedding=embedding, chunks=np.array(chunks), anomaly=anomaly)
     print(f"💾 Сохранён векторный файл: {path.name}")
 
     cleanup_old_embeddings(team_folder)
@@ -55,5 +61,7 @@ def vectorize_report(report_json: dict, team_folder_name: str):
         print("⚠️ Нет текста для векторизации.")
         return
 
-    embedding = model.encode(chunks, show_progress_bar=False)
-    save_embedding(team_folder_name, np.array(embedding).astype("float32"), chunks)
\ No newline at end of file
+    embedding = np.array(model.encode(chunks, show_progress_bar=False)).astype("float32")
+    # оцениваем новые чанки относительно прошлых отчётов и обновляем статистику команды
+    anomaly = score_and_update(BASE_DIR / team_folder_name, embedding, rank=STATS_RANK)
+    save_embedding(team_folder_name, embedding, chunks, anomaly)
\ No newline at end of file